@@ -1,6 +1,307 @@
-from django.contrib import admin
-from .models import Category, Product
+"""
+Admin for the shop's data.
 
-# This tells Django: "Show these tables in the Admin Panel"
-admin.site.register(Category)
-admin.site.register(Product)
\ No newline at end of file
+Changelists have to stay quick with millions of sales, so every admin here:
+- joins the FKs it displays (list_select_related),
+- skips the unfiltered COUNT(*) (show_full_result_count = False),
+- searches only with __exact on an indexed column ("=" would be iexact
+  and "^" istartswith, which a plain index can't serve),
+- uses raw-id inputs instead of dropdowns for big FK targets.
+
+On the biggest tables the paginator also stops counting at COUNT_CAP rows.
+Products and categories are soft-deleted here just as in the shop pages,
+and the changelist shows deleted rows too (all_objects), so they can be
+restored. Sales and branch stock are read-only: they change through
+record_sale() and core/stores.py, which keep the shop-wide stock in step.
+"""
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.paginator import Paginator
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Round
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+
+from . import audit, barcodes
+from .models import (ArchivedExpense, ArchivedSale, AuditLog, Category, Customer, Expense, ExpenseBudget, Job,
+                     MonthlySummary, Product, Sale, Staff, StaffSalesDaily, StockTransfer, Store, StoreStock,
+                     Supplier)
+
+
+class CappedPaginator(Paginator):
+    """Counts at most COUNT_CAP rows: the count is the slowest query on a huge changelist."""
+    COUNT_CAP = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.COUNT_CAP].count()
+
+
+class ShopAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+
+
+class ReadOnlyAdmin(ShopAdmin):
+    """Rows only the app writes (sales, branch stock, logs, rollups, archives)."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# --- SOFT DELETE ---
+class DeletedFilter(admin.SimpleListFilter):
+    title = 'status'
+    parameter_name = 'deleted'
+
+    def lookups(self, request, model_admin):
+        return [('no', 'Active'), ('yes', 'Deleted')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'no':
+            return queryset.filter(deleted_at__isnull=True)
+        if self.value() == 'yes':
+            return queryset.filter(deleted_at__isnull=False)
+        return queryset
+
+
+class SoftDeleteAdmin(ShopAdmin):
+    list_filter = [DeletedFilter]
+    actions = ['restore']
+
+    def get_queryset(self, request):
+        return self.model.all_objects.all()
+
+    def get_deleted_objects(self, objs, request):
+        # Nothing is really deleted, so sales pointing here don't block it
+        names = [str(obj) for obj in objs]
+        return names, {self.opts.verbose_name_plural: len(names)}, set(), []
+
+    def delete_model(self, request, obj):
+        obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.filter(deleted_at__isnull=True):
+            obj.soft_delete()
+
+    @admin.action(description="Restore selected")
+    def restore(self, request, queryset):
+        count = queryset.filter(deleted_at__isnull=False).update(deleted_at=None)
+        audit.log_event('update', self.model, object_repr=f"Admin restore of {count} row(s)",
+                        changes={'restored': count})
+        self.message_user(request, f"{count} restored.")
+
+
+# --- BULK UPDATES ---
+class PriceChangeForm(forms.Form):
+    percent = forms.DecimalField(max_digits=6, decimal_places=2, min_value=-90, max_value=1000,
+                                 help_text="e.g. 5 for +5%, -10 for a 10% cut. Rounded to paise.")
+
+
+class StockChangeForm(forms.Form):
+    change = forms.IntegerField(help_text="Units to add (negative to remove). Stock never goes below 0.")
+
+
+def bulk_update_action(form_class, description):
+    """Admin action that asks for `form_class` and then calls apply(queryset, cleaned_data).
+
+    apply must change every selected row in a single UPDATE and return its count.
+    """
+    def decorator(apply):
+        @admin.action(description=description)
+        def action(modeladmin, request, queryset):
+            form = form_class(request.POST if 'apply' in request.POST else None)
+            if form.is_valid():
+                count = apply(modeladmin, request, queryset, form.cleaned_data)
+                modeladmin.message_user(request, f"{count} {modeladmin.opts.verbose_name_plural} updated.",
+                                        messages.SUCCESS)
+                return None
+            context = {
+                **modeladmin.admin_site.each_context(request),
+                'title': description,
+                'opts': modeladmin.opts,
+                'form': form,
+                'count': queryset.count(),
+                'action': request.POST['action'],
+                'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+                'select_across': request.POST.get('select_across', '0'),
+                'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            }
+            return TemplateResponse(request, 'admin/core/bulk_update.html', context)
+        action.__name__ = apply.__name__
+        return action
+    return decorator
+
+
+# --- CATALOGUE ---
+@admin.register(Category)
+class CategoryAdmin(SoftDeleteAdmin):
+    list_display = ['name', 'deleted_at']
+    ordering = ['name']
+
+
+@admin.register(Product)
+class ProductAdmin(SoftDeleteAdmin):
+    list_display = ['name', 'sku', 'category', 'price', 'cost_price', 'stock_quantity', 'deleted_at']
+    list_select_related = ['category']
+    list_filter = [DeletedFilter, 'category']
+    search_fields = ['sku__exact']
+    ordering = ['name', 'id']
+    actions = ['adjust_price', 'adjust_stock', 'restore']
+
+    def _changed(self, request, queryset_count, description, changes):
+        barcodes.clear_cache()  # the till caches prices
+        audit.log_event('update', Product, object_repr=f"Admin {description} on {queryset_count} product(s)",
+                        changes=changes, user=request.user)
+
+    @bulk_update_action(PriceChangeForm, "Change price by a percentage")
+    def adjust_price(self, request, queryset, data):
+        factor = 1 + data['percent'] / 100
+        count = queryset.update(price=Round(F('price') * Value(factor), 2))
+        self._changed(request, count, "price change", {'percent': data['percent']})
+        return count
+
+    @bulk_update_action(StockChangeForm, "Adjust shop-wide stock")
+    def adjust_stock(self, request, queryset, data):
+        # Only the shop-wide total; branch stock moves through receipts/transfers
+        count = queryset.update(stock_quantity=Greatest(F('stock_quantity') + data['change'], Value(0)))
+        self._changed(request, count, "stock adjustment", {'change': data['change']})
+        return count
+
+
+# --- SALES ---
+@admin.register(Sale)
+class SaleAdmin(ReadOnlyAdmin):
+    list_display = ['id', 'sale_date', 'product', 'quantity', 'total_price', 'sold_by', 'store', 'customer']
+    list_select_related = ['product', 'sold_by', 'store', 'customer']
+    list_filter = ['store']
+    date_hierarchy = 'sale_date'
+    search_fields = ['client_ref__exact', 'product__sku__exact']
+    ordering = ['-sale_date']
+    paginator = CappedPaginator
+
+
+class CustomerAdminForm(forms.ModelForm):
+    class Meta:
+        model = Customer
+        fields = '__all__'
+
+    def clean_phone(self):
+        # Same normalisation as the shop page, so the till's exact lookup finds the customer.
+        # core.forms is imported here: admin loads in every worker, the shop forms don't need to
+        from .forms import CustomerForm
+        return CustomerForm.clean_phone(self)
+
+
+@admin.register(Customer)
+class CustomerAdmin(ShopAdmin):
+    form = CustomerAdminForm
+    list_display = ['name', 'phone', 'total_spent', 'visit_count', 'last_purchase']
+    search_fields = ['phone__exact']
+    ordering = ['-total_spent', 'id']
+    readonly_fields = ['total_spent', 'visit_count', 'last_purchase']
+
+
+# --- EXPENSES ---
+@admin.register(Expense)
+class ExpenseAdmin(ShopAdmin):
+    list_display = ['date_added', 'title', 'category', 'amount', 'added_by', 'staff']
+    list_select_related = ['added_by', 'staff']
+    list_filter = ['category']
+    date_hierarchy = 'date_added'
+    raw_id_fields = ['added_by', 'staff']
+    ordering = ['-date_added', '-id']
+
+
+@admin.register(ExpenseBudget)
+class ExpenseBudgetAdmin(ShopAdmin):
+    list_display = ['category', 'monthly_limit']
+
+
+# --- PEOPLE ---
+@admin.register(Staff)
+class StaffAdmin(ShopAdmin):
+    list_display = ['first_name', 'last_name', 'position', 'store', 'user', 'salary']
+    list_select_related = ['store', 'user']
+    list_filter = ['store']
+    raw_id_fields = ['user']
+
+
+@admin.register(Supplier)
+class SupplierAdmin(ShopAdmin):
+    list_display = ['company_name', 'contact_person', 'phone']
+
+
+# --- BRANCHES ---
+@admin.register(Store)
+class StoreAdmin(ShopAdmin):
+    list_display = ['name', 'code']
+    search_fields = ['code__exact']
+
+
+@admin.register(StoreStock)
+class StoreStockAdmin(ReadOnlyAdmin):
+    list_display = ['store', 'product', 'quantity']
+    list_select_related = ['store', 'product']
+    list_filter = ['store']
+    search_fields = ['product__sku__exact']
+
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(ReadOnlyAdmin):
+    list_display = ['created_at', 'from_store', 'to_store', 'created_by']
+    list_select_related = ['from_store', 'to_store', 'created_by']
+    date_hierarchy = 'created_at'
+
+
+# --- APP-WRITTEN DATA ---
+@admin.register(StaffSalesDaily)
+class StaffSalesDailyAdmin(ReadOnlyAdmin):
+    list_display = ['day', 'user', 'sale_count', 'items_sold', 'revenue']
+    list_select_related = ['user']
+    date_hierarchy = 'day'
+
+
+@admin.register(AuditLog)
+class AuditLogAdmin(ReadOnlyAdmin):
+    list_display = ['timestamp', 'action', 'model', 'object_id', 'object_repr', 'user']
+    list_select_related = ['user']
+    list_filter = ['action']
+    search_fields = ['model__exact']
+    ordering = ['-id']
+    paginator = CappedPaginator
+
+
+@admin.register(Job)
+class JobAdmin(ReadOnlyAdmin):
+    list_display = ['id', 'kind', 'status', 'progress', 'total', 'created_by', 'created_at', 'finished_at']
+    list_select_related = ['created_by']
+    list_filter = ['status', 'kind']
+
+
+@admin.register(MonthlySummary)
+class MonthlySummaryAdmin(ReadOnlyAdmin):
+    list_display = ['year', 'month', 'revenue', 'cogs', 'expenses', 'sale_count']
+    ordering = ['-year', '-month']
+
+
+@admin.register(ArchivedSale)
+class ArchivedSaleAdmin(ReadOnlyAdmin):
+    list_display = ['id', 'sale_date', 'product', 'quantity', 'total_price', 'sold_by', 'store']
+    list_select_related = ['product', 'sold_by', 'store']
+    search_fields = ['product__sku__exact']
+    ordering = ['-sale_date']
+    paginator = CappedPaginator
+
+
+@admin.register(ArchivedExpense)
+class ArchivedExpenseAdmin(ReadOnlyAdmin):
+    list_display = ['date_added', 'title', 'category', 'amount']
+    list_filter = ['category']
+    ordering = ['-date_added']
@@ -0,0 +1,141 @@
+"""
+Archiving closed years.
+
+Sales and expenses from years that are over are moved, in batches, from
+Sale/Expense into ArchivedSale/ArchivedExpense so the live tables only hold
+the current year. Each batch adds its totals to MonthlySummary in the same
+transaction it moves the rows in, so the summaries always match what has
+been archived and a run that stops halfway can simply be started again.
+Reports add the summaries to whatever is still live (see monthly_figures).
+
+Years are calendar years, the same periods the P&L report shows.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import ExtractMonth
+from django.utils import timezone
+
+from . import audit
+from .models import ArchivedExpense, ArchivedSale, Expense, MonthlySummary, Sale
+
+BATCH_SIZE = 2000
+
+
+def closed_years():
+    """Years before the current one that still have live rows."""
+    this_year = timezone.localdate().year
+    years = {d.year for d in Sale.objects.dates('sale_date', 'year')}
+    years |= {d.year for d in Expense.objects.dates('date_added', 'year')}
+    return sorted(y for y in years if y < this_year)
+
+
+def _add_to_summaries(year, totals):
+    for month, changes in totals.items():
+        MonthlySummary.objects.get_or_create(year=year, month=month)
+        MonthlySummary.objects.filter(year=year, month=month).update(
+            **{field: F(field) + value for field, value in changes.items()})
+
+
+def _archive_sale_batch(year, batch_size):
+    with transaction.atomic():
+        batch = list(Sale.objects.filter(sale_date__year=year).select_related('product')
+                     .order_by('id')[:batch_size])
+        if not batch:
+            return 0
+        totals = defaultdict(lambda: defaultdict(Decimal))
+        archived = []
+        for sale in batch:
+            month = totals[timezone.localtime(sale.sale_date).month]
+            month['revenue'] += sale.total_price
+            month['cogs'] += sale.product.cost_price * sale.quantity
+            month['sale_count'] += 1
+            month['items_sold'] += sale.quantity
+            archived.append(ArchivedSale(
+                id=sale.pk, product_id=sale.product_id, quantity=sale.quantity,
+                total_price=sale.total_price, cost_price=sale.product.cost_price,
+                sale_date=sale.sale_date, sold_by_id=sale.sold_by_id, customer_id=sale.customer_id,
+                store_id=sale.store_id, client_ref=sale.client_ref))
+        ArchivedSale.objects.bulk_create(archived)
+        _add_to_summaries(year, totals)
+        with audit.paused():  # moved, not deleted
+            Sale.objects.filter(pk__in=[s.pk for s in batch]).delete()
+    return len(batch)
+
+
+def _archive_expense_batch(year, batch_size):
+    with transaction.atomic():
+        batch = list(Expense.objects.filter(date_added__year=year).order_by('id')[:batch_size])
+        if not batch:
+            return 0
+        totals = defaultdict(lambda: defaultdict(Decimal))
+        for expense in batch:
+            totals[expense.date_added.month]['expenses'] += expense.amount
+        ArchivedExpense.objects.bulk_create([ArchivedExpense(
+            id=e.pk, title=e.title, amount=e.amount, category=e.category, date_added=e.date_added,
+            added_by_id=e.added_by_id, staff_id=e.staff_id, payroll_month=e.payroll_month) for e in batch])
+        _add_to_summaries(year, totals)
+        with audit.paused():
+            Expense.objects.filter(pk__in=[e.pk for e in batch]).delete()
+    return len(batch)
+
+
+def archive_year(year, batch_size=BATCH_SIZE, report=None):
+    """Move one closed year's sales and expenses; returns (sales, expenses) moved."""
+    if year >= timezone.localdate().year:
+        raise ValueError(f"{year} is not over yet; only closed years can be archived.")
+    moved = {}
+    for name, step in (('sales', _archive_sale_batch), ('expenses', _archive_expense_batch)):
+        moved[name] = 0
+        while True:
+            count = step(year, batch_size)
+            if not count:
+                break
+            moved[name] += count
+            if report:
+                report(year, name, moved[name])
+    if moved['sales'] or moved['expenses']:
+        audit.log_event('update', MonthlySummary, year, f"Archived {year}", moved)
+    return moved['sales'], moved['expenses']
+
+
+def monthly_figures(year):
+    """{month: {'revenue', 'cogs', 'expenses'}} for a year, live plus archived.
+
+    Two grouped queries over the live tables (COGS at today's cost price) and
+    one read of the frozen summaries.
+    """
+    figures = defaultdict(lambda: {'revenue': Decimal(0), 'cogs': Decimal(0), 'expenses': Decimal(0)})
+
+    sales = (Sale.objects.filter(sale_date__year=year)
+             .annotate(m=ExtractMonth('sale_date')).values('m')
+             .annotate(revenue=Sum('total_price'),
+                       cogs=Sum(F('quantity') * F('product__cost_price'),
+                                output_field=DecimalField(max_digits=14, decimal_places=2)),
+                       count=Count('id')))
+    for row in sales:
+        figures[row['m']]['revenue'] += row['revenue'] or 0
+        figures[row['m']]['cogs'] += row['cogs'] or 0
+
+    expenses = (Expense.objects.filter(date_added__year=year)
+                .annotate(m=ExtractMonth('date_added')).values('m').annotate(total=Sum('amount')))
+    for row in expenses:
+        figures[row['m']]['expenses'] += row['total'] or 0
+
+    for summary in MonthlySummary.objects.filter(year=year):
+        month = figures[summary.month]
+        month['revenue'] += summary.revenue
+        month['cogs'] += summary.cogs
+        month['expenses'] += summary.expenses
+    return figures
+
+
+def report_years():
+    """Every year the P&L report has something to show for, newest first."""
+    years = set(MonthlySummary.objects.values_list('year', flat=True).distinct())
+    years |= {d.year for d in Sale.objects.dates('sale_date', 'year')}
+    years |= {d.year for d in Expense.objects.dates('date_added', 'year')}
+    years.add(timezone.localdate().year)
+    return sorted(years, reverse=True)
@@ -0,0 +1,125 @@
+"""
+Audit trail.
+
+post_save/post_delete on the core models turn into AuditLog rows. Inside a
+request the entries are only collected in memory and AuditMiddleware writes
+them with a single bulk_create once the response is ready, so a sale costs
+one list append rather than an extra INSERT. Entries are added on commit,
+so a rolled-back save never shows up in the log. Outside a request
+(management commands, job workers) each entry is written straight away.
+
+Queryset .update() and bulk_create() don't send signals, so the code doing
+bulk writes (payroll, CSV import, stock receipts, archiving) records one
+summary entry with log_event() instead. Sales and transfers already leave
+their own Sale/StockTransfer rows. The report pages rely on this: the
+newest AuditLog row is their cache version (see core/caching.py).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import (AuditLog, Category, Customer, Expense, Product, Sale,
+                     Staff, StockTransfer, Store, Supplier)
+
+AUDITED_MODELS = [Category, Product, Sale, Expense, Customer, Staff, Supplier, Store, StockTransfer]
+
+# Entries waiting for the end of the current request (None = write immediately)
+_buffer = ContextVar('audit_buffer', default=None)
+_paused = ContextVar('audit_paused', default=False)
+
+
+@contextmanager
+def paused():
+    """Skip signal-driven entries, e.g. while the archiver moves old rows."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def _snapshot(instance, field_names=None):
+    fields = instance._meta.concrete_fields
+    if field_names is not None:
+        fields = [f for f in fields if f.name in field_names or f.attname in field_names]
+    return {f.attname: getattr(instance, f.attname) for f in fields}
+
+
+def _write(entries):
+    AuditLog.objects.bulk_create(entries)
+
+
+def _add(entry):
+    buffer = _buffer.get()
+    if buffer is None:
+        _write([entry])
+    else:
+        buffer.append(entry)
+
+
+def log_event(action, model, object_id='', object_repr='', changes=None, user=None):
+    """Record an event that isn't tied to one saved instance, e.g. a bulk write."""
+    entry = AuditLog(
+        action=action,
+        model=model._meta.label_lower,
+        object_id='' if object_id is None else str(object_id),
+        object_repr=str(object_repr)[:200],
+        changes=changes or {},
+        user=user,
+    )
+    transaction.on_commit(lambda: _add(entry))
+
+
+def log(action, instance, changes=None, user=None):
+    """Record an event by hand (the signal handlers cover ordinary saves)."""
+    log_event(action, type(instance), instance.pk, instance, changes, user)
+
+
+def _saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or _paused.get():  # raw: loaddata
+        return
+    if update_fields and 'deleted_at' in update_fields and getattr(instance, 'deleted_at', None):
+        action = 'delete'  # soft delete
+    else:
+        action = 'create' if created else 'update'
+    log(action, instance, _snapshot(instance, update_fields))
+
+
+def _deleted(sender, instance, **kwargs):
+    if _paused.get():
+        return
+    log('delete', instance, _snapshot(instance))
+
+
+def connect():
+    for model in AUDITED_MODELS:
+        post_save.connect(_saved, sender=model, dispatch_uid=f'audit_save_{model.__name__}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'audit_delete_{model.__name__}')
+
+
+class AuditMiddleware:
+    """Collect audit entries for the request and write them in one go.
+
+    Goes after AuthenticationMiddleware so the entries can be stamped with
+    the logged-in user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        buffer = []
+        token = _buffer.set(buffer)
+        try:
+            return self.get_response(request)
+        finally:
+            _buffer.reset(token)
+            if buffer:
+                user = getattr(request, 'user', None)
+                user_id = user.pk if user is not None and user.is_authenticated else None
+                for entry in buffer:
+                    if entry.user_id is None:
+                        entry.user_id = user_id
+                _write(buffer)
@@ -0,0 +1,32 @@
+"""
+Cached user lookup.
+
+ModelBackend.get_user() costs a query on every authenticated request. This
+backend keeps the User row in the default cache instead; core/signals.py
+drops the entry whenever the user is saved or deleted, so a password change
+or deactivation still takes effect on the very next request. Changes made
+with queryset .update() are picked up once the entry times out.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = 300
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
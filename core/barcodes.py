@@ -0,0 +1,42 @@
+"""
+Barcode -> product lookup for the till.
+
+Scans go through an in-process LRU cache holding (id, name, price) per
+code, so a repeat scan costs no query at all. The cache is cleared whenever
+a Product is saved or deleted in this process (core/signals.py) and, to
+bound staleness from edits made in other worker processes, at least every
+CACHE_TTL seconds. Stock isn't cached: checkout re-reads it from the DB.
+"""
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from .models import Product
+
+CACHE_TTL = 60
+
+ScannedProduct = namedtuple('ScannedProduct', ['id', 'name', 'price'])
+
+_cleared_at = time.monotonic()
+
+
+@lru_cache(maxsize=20000)
+def _lookup(code):
+    row = Product.objects.filter(sku=code).values_list('id', 'name', 'price').first()
+    return ScannedProduct(*row) if row else None
+
+
+def clear_cache():
+    global _cleared_at
+    _lookup.cache_clear()
+    _cleared_at = time.monotonic()
+
+
+def product_for_code(code):
+    """Return a ScannedProduct for a scanned code, or None if unknown."""
+    code = (code or '').strip()
+    if not code:
+        return None
+    if time.monotonic() - _cleared_at > CACHE_TTL:
+        clear_cache()
+    return _lookup(code)
@@ -0,0 +1,47 @@
+"""
+Conditional GET for the read-only report pages.
+
+Those pages only change when sales, expenses or stock do, and every such
+write leaves an AuditLog row (see core/audit.py), so the newest audit row is
+a version number for the data. It is one primary-key lookup; when it, the
+user, the branch and the date all match what the browser already has, the
+view doesn't run and a 304 with no body goes back - which is most dashboard
+refreshes at a branch on a slow link.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import AuditLog
+from .stores import current_store
+
+
+def _latest_change(request):
+    if not hasattr(request, '_latest_change'):
+        # None when a flash message is waiting: that page has to be rendered
+        if get_messages(request):
+            request._latest_change = None
+        else:
+            request._latest_change = AuditLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return request._latest_change
+
+
+def report_etag(request, *args, **kwargs):
+    latest = _latest_change(request)
+    if latest is None:
+        return None
+    store = current_store(request)
+    key = f"{latest}:{request.user.pk}:{store.pk if store else 0}:{timezone.localdate()}:{request.get_full_path()}"
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_report(view):
+    """ETag on a report view; browsers must revalidate every time.
+
+    No Last-Modified: a date can't tell the user, branch or page apart, so an
+    If-Modified-Since alone would get one branch's dashboard a 304 for another's.
+    """
+    return cache_control(private=True, no_cache=True)(condition(etag_func=report_etag)(view))
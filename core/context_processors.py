@@ -0,0 +1,11 @@
+from .stores import all_stores, current_store
+
+
+def stores(request):
+    # Feeds the branch switcher in base.html
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'current_store': current_store(request),
+        'store_list': all_stores(),
+    }
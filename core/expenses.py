@@ -0,0 +1,73 @@
+"""
+Expense analytics: spend per category per month against budgets.
+
+The whole breakdown (every category, the selected month and the months
+before it) comes from one GROUP BY over the date range, which the
+(category, date_added) index covers. Archived expenses only get their own
+query when the range reaches back into an archived year.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ArchivedExpense, Expense, ExpenseBudget, MonthlySummary
+
+TREND_MONTHS = 6
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _spend_by_month(model, start, end):
+    rows = (model.objects.filter(date_added__gte=start, date_added__lt=end)
+            .annotate(month=TruncMonth('date_added')).values('category', 'month')
+            .annotate(total=Sum('amount')).order_by())
+    return [(r['category'], r['month'], r['total']) for r in rows]
+
+
+def category_breakdown(month, trend_months=TREND_MONTHS):
+    """Spend per category for `month`, with budget variance and a short trend.
+
+    Returns (months, rows): months is the list of month starts shown in the
+    trend, oldest first; each row has category, label, spent, budget,
+    variance (budget - spent, None without a budget), percent_used and
+    trend (spend per month, aligned with months).
+    """
+    month = month_start(month)
+    months = [add_months(month, offset) for offset in range(1 - trend_months, 1)]
+    start, end = months[0], add_months(month, 1)
+
+    spend = _spend_by_month(Expense, start, end)
+    if MonthlySummary.objects.filter(year__range=(start.year, month.year)).exists():
+        spend += _spend_by_month(ArchivedExpense, start, end)
+
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    for category, row_month, total in spend:
+        totals[category][row_month] += total or 0
+
+    budgets = dict(ExpenseBudget.objects.values_list('category', 'monthly_limit'))
+    rows = []
+    for category, label in Expense.CATEGORY_CHOICES:
+        spent = totals[category][month]
+        budget = budgets.get(category)
+        if not spent and budget is None and not any(totals[category].values()):
+            continue
+        rows.append({
+            'category': category,
+            'label': label,
+            'spent': spent,
+            'budget': budget,
+            'variance': budget - spent if budget is not None else None,
+            'percent_used': int(spent * 100 / budget) if budget else None,
+            'trend': [totals[category][m] for m in months],
+        })
+    return months, rows
@@ -1,5 +1,6 @@
 from django import forms
-from .models import Product, Category, Sale,Expense , Customer ,Staff ,Supplier
+from .models import Product, Category, Sale,Expense , Customer ,Staff ,Supplier ,Store
+from .sales import find_customer, normalize_phone
 
 
 # 1. Category Form
@@ -13,19 +14,36 @@ class CategoryForm(forms.ModelForm):
 
 # 2. Product Form (Fixed: uses image_url instead of image)
 class ProductForm(forms.ModelForm):
+    image_upload = forms.ImageField(
+        required=False, label='Or upload an image',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': 'image/*'}))
+
     class Meta:
         model = Product
-        fields = ['name', 'category', 'price', 'stock_quantity', 'image_url']  # <--- Changed to image_url
+        fields = ['name', 'sku', 'category', 'price', 'stock_quantity', 'image_url']  # <--- Changed to image_url
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'sku': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Scan or type barcode'}),
             'category': forms.Select(attrs={'class': 'form-control'}),
             'price': forms.NumberInput(attrs={'class': 'form-control'}),
             'stock_quantity': forms.NumberInput(attrs={'class': 'form-control'}),
             'image_url': forms.URLInput(attrs={'class': 'form-control', 'placeholder': 'Paste Image Link Here'}),
         }
 
+    def clean_image_upload(self):
+        from .images import MAX_DOWNLOAD_BYTES
+
+        upload = self.cleaned_data.get('image_upload')
+        if upload and upload.size > MAX_DOWNLOAD_BYTES:
+            raise forms.ValidationError(f"Images must be under {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB.")
+        return upload
+
 # 3. Sale Form (New!)
 class SaleForm(forms.ModelForm):
+    customer_phone = forms.CharField(
+        max_length=20, required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Customer phone (optional)'}))
+
     class Meta:
         model = Sale
         fields = ['quantity']
@@ -33,6 +51,14 @@ class SaleForm(forms.ModelForm):
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'placeholder': 'Quantity'}),
         }
 
+    def clean(self):
+        cleaned = super().clean()
+        phone = cleaned.get('customer_phone')
+        cleaned['customer'] = find_customer(phone) if phone else None
+        if phone and cleaned['customer'] is None:
+            self.add_error('customer_phone', "No customer with this phone number.")
+        return cleaned
+
 # 4. Expense Form
 class ExpenseForm(forms.ModelForm):
     class Meta:
@@ -45,6 +71,24 @@ class ExpenseForm(forms.ModelForm):
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '0.00'}),
         }
 
+
+class ExpenseFilterForm(forms.Form):
+    month = forms.DateField(
+        required=False, input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month', 'class': 'form-control form-control-sm'}, format='%Y-%m'))
+    category = forms.ChoiceField(
+        required=False, choices=[('', 'All categories')] + Expense.CATEGORY_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    q = forms.CharField(required=False, widget=forms.TextInput(
+        attrs={'class': 'form-control form-control-sm', 'placeholder': 'Search title'}))
+
+
+class ExpenseBudgetForm(forms.Form):
+    category = forms.ChoiceField(choices=Expense.CATEGORY_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
+    monthly_limit = forms.DecimalField(
+        min_value=0, max_digits=10, decimal_places=2, help_text="0 removes the budget.",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Monthly budget'}))
+
 # 5. Customer form
 # In core/forms.py
 
@@ -59,11 +103,16 @@ class CustomerForm(forms.ModelForm):
             'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Enter Address'}), # 'rows': 3 makes it smaller
         }
 
+    def clean_phone(self):
+        # Stored normalised so the till lookup is a plain indexed equality match
+        return normalize_phone(self.cleaned_data['phone'])
+
 # 6. staff salary 
 class StaffForm(forms.ModelForm):
     class Meta:
         model = Staff
-        fields = ['first_name', 'last_name', 'position', 'phone', 'salary']
+        fields = ['first_name', 'last_name', 'position', 'phone', 'salary', 'user', 'store']
+        labels = {'user': 'Login account', 'store': 'Home branch'}
 
 #7. supplier
 class SupplierForm(forms.ModelForm):
@@ -76,4 +125,55 @@ class SupplierForm(forms.ModelForm):
             'phone': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Phone Number'}),
             'email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Email (Optional)'}),
             'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Address'}),
-        }
\ No newline at end of file
+        }
+
+#8. product import (CSV, processed by a background job)
+class ProductImportForm(forms.Form):
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
+
+#9. payroll run
+class PayrollForm(forms.Form):
+    month = forms.DateField(
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month', 'class': 'form-control'}, format='%Y-%m'))
+
+#10. till scanning
+class ScanForm(forms.Form):
+    code = forms.CharField(max_length=64, widget=forms.TextInput(
+        attrs={'class': 'form-control form-control-lg', 'placeholder': 'Scan barcode', 'autofocus': True,
+               'autocomplete': 'off'}))
+    quantity = forms.IntegerField(min_value=1, initial=1, required=False, widget=forms.NumberInput(
+        attrs={'class': 'form-control form-control-lg', 'min': '1'}))
+
+#11. branches
+class StoreForm(forms.ModelForm):
+    class Meta:
+        model = Store
+        fields = ['name', 'code', 'address']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Branch name'}),
+            'code': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Short code, e.g. BR2'}),
+            'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Address'}),
+        }
+
+
+STOCK_LINES_WIDGET = forms.Textarea(attrs={'class': 'form-control', 'rows': 5, 'placeholder': 'SKU or product ID, quantity\n890123, 10'})
+
+
+class StoreStockForm(forms.Form):
+    store = forms.ModelChoiceField(queryset=Store.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    lines = forms.CharField(widget=STOCK_LINES_WIDGET)
+    new_delivery = forms.BooleanField(required=False, initial=True,
+                                      label="New delivery (adds to the shop-wide total)")
+
+
+class StockTransferForm(forms.Form):
+    from_store = forms.ModelChoiceField(queryset=Store.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    to_store = forms.ModelChoiceField(queryset=Store.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    lines = forms.CharField(widget=STOCK_LINES_WIDGET)
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('from_store') and cleaned.get('from_store') == cleaned.get('to_store'):
+            raise forms.ValidationError("Pick two different branches.")
+        return cleaned
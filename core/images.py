@@ -0,0 +1,174 @@
+"""
+Product images.
+
+An image (uploaded, or fetched once from Product.image_url) is stored under
+MEDIA_ROOT/products/ named by its content hash, then shrunk to a few
+thumbnail sizes on a thread pool. Because a filename only ever maps to one
+set of bytes, thumbnails can be served with a one-year cache lifetime.
+
+Thumbnailing needs Pillow; without it the job fails with a clear message
+and pages keep showing the placeholder icon.
+
+image_url is typed in by shop staff but fetched by the server, so links
+(and every redirect they lead to) must resolve to public addresses only.
+"""
+import hashlib
+import http.client
+import ipaddress
+import os
+import re
+import socket
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .models import Product
+
+# name -> longest edge in pixels
+THUMBNAIL_SIZES = {'sm': 64, 'lg': 600}
+THUMBNAIL_NAME_RE = re.compile(rf"^[0-9a-f]{{24}}_({'|'.join(THUMBNAIL_SIZES)})\.jpg$")
+
+MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 15
+
+
+def image_dir():
+    folder = os.path.join(settings.MEDIA_ROOT, 'products')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def thumbnail_name(digest, size):
+    return f"{digest}_{size}.jpg"
+
+
+def store_original(data):
+    """Save raw image bytes once; returns the content hash."""
+    digest = hashlib.sha256(data).hexdigest()[:24]
+    path = os.path.join(image_dir(), f"{digest}.orig")
+    if not os.path.exists(path):
+        with open(path, 'wb') as fh:
+            fh.write(data)
+    return digest
+
+
+def _check_address(ip):
+    address = ipaddress.ip_address(ip.split('%')[0])
+    address = getattr(address, 'ipv4_mapped', None) or address  # ::ffff:127.0.0.1
+    if not address.is_global or address.is_multicast:
+        raise ValueError(f"Image links must point to a public host, not {ip}.")
+
+
+def check_public_url(url):
+    """Raise ValueError unless `url` is http(s) on a host with only public addresses.
+
+    This gives a clear error up front; the connection itself is checked
+    again (see _public_connection), since DNS may answer differently then.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f"Only http(s) image links can be fetched, got {url!r}.")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Can't resolve the host in {url!r}.")
+    for info in infos:
+        _check_address(info[4][0])
+
+
+def _public_connection(address, *args, **kwargs):
+    # Check the peer we actually reached, so a host that re-resolves to an
+    # internal address between the check and the connect is still refused
+    sock = socket.create_connection(address, *args, **kwargs)
+    try:
+        _check_address(sock.getpeername()[0])
+    except ValueError:
+        sock.close()
+        raise
+    return sock
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_public_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No ProxyHandler: going through a proxy would hide the real peer address
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler,
+                                      _CheckedRedirects)
+
+
+def fetch_remote(url):
+    check_public_url(url)
+    request = urllib.request.Request(url, headers={'User-Agent': 'ShopMaster/1.0'})
+    with _opener.open(request, timeout=DOWNLOAD_TIMEOUT) as response:
+        data = response.read(MAX_DOWNLOAD_BYTES + 1)
+    if len(data) > MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"Image at {url} is larger than {MAX_DOWNLOAD_BYTES} bytes.")
+    return data
+
+
+def _make_thumbnail(digest, size):
+    from PIL import Image
+
+    target = os.path.join(image_dir(), thumbnail_name(digest, size))
+    if os.path.exists(target):
+        return
+    with Image.open(os.path.join(image_dir(), f"{digest}.orig")) as img:
+        img = img.convert('RGB')  # drops alpha; JPEG has none
+        img.thumbnail((THUMBNAIL_SIZES[size], THUMBNAIL_SIZES[size]))
+        tmp = f"{target}.tmp"
+        img.save(tmp, 'JPEG', quality=82, optimize=True, progressive=True)
+    os.replace(tmp, target)  # never serve a half-written file
+
+
+def make_thumbnails(digest):
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Pillow is not installed; run `pip install Pillow` to enable product thumbnails.")
+    with ThreadPoolExecutor(max_workers=len(THUMBNAIL_SIZES)) as pool:
+        # list() re-raises any error from the pool threads
+        list(pool.map(lambda size: _make_thumbnail(digest, size), THUMBNAIL_SIZES))
+
+
+def ingest(product_id, digest=None):
+    """Thumbnail a product's image and point the product at it.
+
+    Pass `digest` for an image already stored with store_original() (an
+    upload); otherwise Product.image_url is downloaded. image_hash is only
+    set once every size exists, so pages never link to a missing thumbnail.
+    """
+    if digest is None:
+        url = Product.objects.filter(pk=product_id).values_list('image_url', flat=True).first()
+        if not url:
+            return None
+        digest = store_original(fetch_remote(url))
+    make_thumbnails(digest)
+    Product.objects.filter(pk=product_id).update(image_hash=digest)
+    return digest
@@ -0,0 +1,240 @@
+"""
+Small DB-backed job queue.
+
+Views call enqueue() and return straight away; the `run_workers` management
+command claims queued jobs and runs the handler registered for their kind.
+No broker is involved - the Job table is the queue.
+"""
+import os
+import traceback
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Job
+
+HANDLERS = {}
+
+# Write progress to the DB at most every N items so big jobs don't hammer it
+PROGRESS_STEP = 200
+
+# How often run_workers refreshes Job.heartbeat_at for the jobs it is running
+HEARTBEAT_SECONDS = 30
+
+
+def handler(kind):
+    """Register a function as the handler for a job kind.
+
+    Handlers are called as func(payload, progress) and may return a dict,
+    which is stored on Job.result.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, payload=payload or {}, created_by=user)
+
+
+def claim_next():
+    """Move the oldest queued job to 'running' and return it (None if idle).
+
+    The claim is a conditional UPDATE, so two workers racing for the same row
+    can't both win it.
+    """
+    while True:
+        job_id = (Job.objects.filter(status=Job.STATUS_QUEUED)
+                  .order_by('created_at', 'id')
+                  .values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, started_at=now, heartbeat_at=now)
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def heartbeat(job_ids):
+    """Mark jobs as still being worked on; run_workers calls this every HEARTBEAT_SECONDS."""
+    Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+
+def fail_stale(older_than):
+    """Fail running jobs with no heartbeat for `older_than` (a timedelta).
+
+    Live workers keep their jobs' heartbeat fresh however long they take, so
+    only jobs whose worker died match. They are failed rather than re-queued
+    because handlers such as import_products aren't safe to run twice; the
+    user can start them again.
+    """
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status=Job.STATUS_RUNNING, heartbeat_at__lt=cutoff).update(
+        status=Job.STATUS_FAILED, finished_at=timezone.now(),
+        error="The worker running this job stopped before it finished.")
+
+
+class Progress:
+    """Callable handed to handlers: progress(done, total=None)."""
+
+    def __init__(self, job):
+        self.job = job
+        self.last_saved = -PROGRESS_STEP
+
+    def __call__(self, done, total=None):
+        fields = {}
+        if total is not None and total != self.job.total:
+            self.job.total = fields['total'] = total
+        if fields or done - self.last_saved >= PROGRESS_STEP or done == self.job.total:
+            self.job.progress = fields['progress'] = done
+            self.last_saved = done
+            Job.objects.filter(pk=self.job.pk).update(**fields)
+
+
+def run_job(job):
+    func = HANDLERS.get(job.kind)
+    try:
+        if func is None:
+            raise ValueError(f"No handler registered for '{job.kind}'")
+        result = func(job.payload, Progress(job)) or {}
+    except Exception:
+        Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_FAILED, error=traceback.format_exc(), finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_DONE, result=result, finished_at=timezone.now())
+
+
+def execute(job_id):
+    """Entry point for worker threads/processes."""
+    close_old_connections()
+    try:
+        run_job(Job.objects.get(pk=job_id))
+    finally:
+        connection.close()
+
+
+def job_file_path(name):
+    """Absolute path for a file produced or consumed by a job."""
+    # Private: only job_download (which checks the owner) serves these
+    folder = os.path.join(settings.PRIVATE_FILES_ROOT, 'jobs')
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+# --- HANDLERS ---
+
+@handler('export_sales')
+def export_sales(payload, progress):
+    import csv
+
+    from .models import Sale
+
+    sales = Sale.objects.order_by('id').values_list(
+        'id', 'sale_date', 'product__name', 'quantity', 'total_price', 'sold_by__username')
+    total = sales.count()
+    progress(0, total)
+
+    name = f"sales_{timezone.now():%Y%m%d}_{uuid.uuid4().hex}.csv"
+    with open(job_file_path(name), 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['id', 'date', 'product', 'quantity', 'total_price', 'sold_by'])
+        for done, row in enumerate(sales.iterator(chunk_size=2000), start=1):
+            writer.writerow(row)
+            progress(done)
+    progress(total)
+    return {'file': name, 'rows': total}
+
+
+@handler('import_products')
+def import_products(payload, progress):
+    """Bulk-load products from an uploaded CSV.
+
+    Columns: name, category, price, cost_price, stock_quantity, image_url
+    (only name, category and price are required).
+    """
+    import csv
+
+    from .models import Category, Product
+
+    # utf-8-sig: Excel puts a BOM in front of the first header
+    with open(job_file_path(payload['file']), newline='', encoding='utf-8-sig') as fh:
+        rows = list(csv.DictReader(fh))
+    progress(0, len(rows))
+
+    categories = {c.name: c for c in Category.objects.all()}
+    batch, created, skipped = [], 0, []
+    for line, row in enumerate(rows, start=2):  # line 1 is the header
+        try:
+            name = row['name'].strip()
+            cat_name = row['category'].strip()
+            price = Decimal(row['price'])
+            cost = Decimal(row.get('cost_price') or 0)
+            stock = int(row.get('stock_quantity') or 0)
+        except (KeyError, AttributeError, InvalidOperation, ValueError):
+            skipped.append(line)
+            continue
+        if not name or not cat_name:
+            skipped.append(line)
+            continue
+        if cat_name not in categories:
+            categories[cat_name] = Category.objects.create(name=cat_name)
+        batch.append(Product(name=name, category=categories[cat_name], price=price,
+                             cost_price=cost, stock_quantity=stock,
+                             image_url=(row.get('image_url') or '').strip()))
+        if len(batch) >= 500:
+            Product.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+        progress(line - 1)
+    Product.objects.bulk_create(batch)
+    created += len(batch)
+    if created:
+        from .audit import log_event
+        log_event('create', Product, object_repr="CSV import", changes={'created': created, 'file': payload['file']})
+    progress(len(rows))
+    return {'created': created, 'skipped_lines': skipped}
+
+
+@handler('rebuild_staff_sales')
+def rebuild_staff_sales(payload, progress):
+    from .rollups import rebuild_staff_sales as rebuild
+
+    progress(0, 1)
+    rows = rebuild()
+    progress(1)
+    return {'rows': rows}
+
+
+@handler('product_images')
+def product_images(payload, progress):
+    """Download/thumbnail product images.
+
+    payload: {'ids': [...]} to fetch image_url for those products (all
+    products with a URL but no local copy if omitted), or
+    {'ids': [id], 'digest': ...} for an image that was uploaded.
+    """
+    from .images import ingest
+    from .models import Product
+
+    ids = payload.get('ids')
+    if ids is None:
+        ids = list(Product.objects.exclude(image_url='').filter(image_hash='').values_list('id', flat=True))
+    progress(0, len(ids))
+    failed = {}
+    for done, product_id in enumerate(ids, start=1):
+        try:
+            ingest(product_id, payload.get('digest'))
+        except Exception as e:
+            failed[product_id] = str(e)
+        progress(done)
+    if failed and len(failed) == len(ids):
+        raise RuntimeError(f"No images could be processed: {failed}")
+    return {'processed': len(ids) - len(failed), 'failed': failed}
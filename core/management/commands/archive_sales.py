@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archive import BATCH_SIZE, archive_year, closed_years
+
+
+class Command(BaseCommand):
+    help = "Move sales and expenses of closed years into the archive tables (safe to re-run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append',
+                            help="Year to archive (repeatable); defaults to every closed year.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        years = options['year'] or closed_years()
+        if not years:
+            self.stdout.write("Nothing to archive.")
+            return
+
+        def report(year, name, moved):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {year}: {moved} {name} moved")
+
+        for year in years:
+            try:
+                sales, expenses = archive_year(year, options['batch_size'], report)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"{year}: archived {sales} sale(s) and {expenses} expense(s)."))
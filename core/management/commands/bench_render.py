@@ -0,0 +1,55 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from core.templatetags.currency_filters import _format, format_rupees
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmarks for money formatting and report template rendering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Rows in the synthetic report.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        amounts = [Decimal(i * 7919) / 100 for i in range(rows)]
+
+        def format_cold():
+            _format.cache_clear()
+            for a in amounts:
+                format_rupees(a)
+
+        def format_warm():
+            for a in amounts:
+                format_rupees(a)
+
+        format_warm()
+        self.stdout.write(f"rupees x{rows} (cold cache): {self._best(format_cold, repeat):.2f} ms")
+        self.stdout.write(f"rupees x{rows} (warm cache): {self._best(format_warm, repeat):.2f} ms")
+
+        report = [{
+            'month': 'Jan', 'revenue': a, 'cogs': a / 2, 'gross_profit': a / 2,
+            'expenses': a / 4, 'net_profit': a / 4,
+        } for a in amounts]
+        context = {
+            'current_year': 2026, 'monthly_report': report, 'total_revenue': sum(amounts),
+            'total_expenses': 0, 'gross_profit': 0, 'net_profit': 0, 'profit_margin': 0,
+        }
+        first = self._best(lambda: get_template('core/profit_loss.html'), 1)
+        template = get_template('core/profit_loss.html')
+        render = self._best(lambda: template.render(context), repeat)
+        self.stdout.write(f"profit_loss.html load: {first:.2f} ms (first), "
+                          f"{self._best(lambda: get_template('core/profit_loss.html'), repeat):.2f} ms (again)")
+        self.stdout.write(f"profit_loss.html render with {rows} rows: {render:.2f} ms")
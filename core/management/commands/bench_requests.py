@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = "Time logged-in requests through the full middleware stack and count their queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to log in as (defaults to the first superuser).")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per path.")
+        parser.add_argument('--path', action='append', help="Path to request (repeatable); defaults to the till.")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError("No user to log in as; pass --user.")
+
+        hosts = [h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')]
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        client.force_login(user)
+        count = max(1, options['requests'])
+
+        for path in options['path'] or [reverse('till')]:
+            response = client.get(path)  # warm-up: fills caches, compiles templates
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(count):
+                    client.get(path)
+                elapsed = time.perf_counter() - start
+            fixed = sum(1 for q in queries if 'FROM "django_session"' in q['sql'] or 'FROM "auth_user"' in q['sql'])
+            self.stdout.write(
+                f"{path} [{response.status_code}]: {elapsed * 1000 / count:.2f} ms/request, "
+                f"{len(queries) / count:.1f} queries/request ({fixed / count:.1f} session/user)")
@@ -0,0 +1,34 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Book one salary expense per staff member for a month (safe to re-run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="YYYY-MM, defaults to the current month.")
+        parser.add_argument('--user', help="Username to record as 'added by' (defaults to the first superuser).")
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must look like 2026-01")
+        else:
+            month = timezone.localdate()
+
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError("No user to record the expenses against; pass --user.")
+
+        created = run_payroll(month, user)
+        self.stdout.write(self.style.SUCCESS(f"{month:%B %Y}: {created} salary expense(s) created."))
@@ -0,0 +1,73 @@
+import datetime
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+def _init_process():
+    # Each child process needs its own Django setup and DB connection
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (exports, imports, rebuilds) from the Job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Jobs to run at the same time.")
+        parser.add_argument('--processes', action='store_true',
+                            help="Use a process pool instead of threads (for CPU-heavy jobs).")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit.")
+        parser.add_argument('--stale-after', type=float, default=5,
+                            help="Minutes without a heartbeat after which a 'running' job is failed "
+                                 "(its worker has died).")
+        parser.add_argument('--housekeeping', type=float, default=3600,
+                            help="Seconds between expired-session cleanups (0 turns it off).")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if options['processes']:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+        stale = jobs.fail_stale(datetime.timedelta(minutes=options['stale_after']))
+        if stale:
+            self.stdout.write(f"Marked {stale} abandoned job(s) as failed.")
+        self.stdout.write(f"Worker pool started ({workers} {'processes' if options['processes'] else 'threads'}).")
+        running = {}  # future -> job id
+        next_housekeeping = next_heartbeat = time.monotonic()
+        try:
+            while True:
+                if options['housekeeping'] and time.monotonic() >= next_housekeeping:
+                    # Same as `manage.py clearsessions`, so no separate cron entry is needed
+                    call_command('clearsessions')
+                    next_housekeeping = time.monotonic() + options['housekeeping']
+                running = {f: job_id for f, job_id in running.items() if not f.done()}
+                if running and time.monotonic() >= next_heartbeat:
+                    jobs.heartbeat(list(running.values()))
+                    next_heartbeat = time.monotonic() + jobs.HEARTBEAT_SECONDS
+                idle = False
+                while len(running) < workers:
+                    job = jobs.claim_next()
+                    if job is None:
+                        idle = True
+                        break
+                    self.stdout.write(f"Running {job}")
+                    running[pool.submit(jobs.execute, job.pk)] = job.pk
+
+                if running:
+                    wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                elif options['once']:
+                    break
+                elif idle:
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, waiting for running jobs...")
+        finally:
+            pool.shutdown(wait=True)
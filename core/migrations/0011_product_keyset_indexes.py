@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='core_produc_name_db9baa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='core_produc_price_a0c162_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_quantity', 'id'], name='core_produc_stock_q_86ef8f_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-19 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_phones(apps, schema_editor):
+    # Match core.sales.normalize_phone so existing customers can be found at the till
+    Customer = apps.get_model('core', 'Customer')
+    for customer in Customer.objects.only('id', 'phone').iterator():
+        raw = (customer.phone or '').strip()
+        digits = ''.join(ch for ch in raw if ch.isdigit())
+        phone = f"+{digits}" if raw.startswith('+') else digits
+        if phone != customer.phone:
+            Customer.objects.filter(pk=customer.pk).update(phone=phone)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_purchase',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='visit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='core.customer'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-total_spent', 'id'], name='core_custom_total_s_fdc4dc_idx'),
+        ),
+        migrations.RunPython(normalize_phones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-19 10:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_staff_sales(apps, schema_editor):
+    # Same as core.rollups.rebuild_staff_sales, for sales made before the rollup existed
+    Sale = apps.get_model('core', 'Sale')
+    StaffSalesDaily = apps.get_model('core', 'StaffSalesDaily')
+    totals = (Sale.objects.annotate(day=TruncDate('sale_date', tzinfo=timezone.get_current_timezone()))
+              .values('sold_by', 'day')
+              .annotate(sale_count=Count('id'), items_sold=Sum('quantity'), revenue=Sum('total_price')))
+    StaffSalesDaily.objects.bulk_create([
+        StaffSalesDaily(user_id=t['sold_by'], day=t['day'], sale_count=t['sale_count'],
+                        items_sold=t['items_sold'], revenue=t['revenue'])
+        for t in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_customer_purchase_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='payroll_month',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salary_expenses', to='core.staff'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='staff_profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(condition=models.Q(('staff__isnull', False)), fields=('staff', 'payroll_month'), name='unique_salary_per_staff_month'),
+        ),
+        migrations.AddField(
+            model_name='staffsalesdaily',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='staffsalesdaily',
+            index=models.Index(fields=['day'], name='core_staffs_day_638689_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='staffsalesdaily',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_staff_sales_day'),
+        ),
+        migrations.RunPython(backfill_staff_sales, migrations.RunPython.noop),
+    ]
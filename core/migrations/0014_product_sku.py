@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_staff_sales_and_payroll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=24),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 6.0 on 2026-10-19 10:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_product_image_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Store',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('address', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StoreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lines', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('from_store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_out', to='core.store')),
+                ('to_store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_in', to='core.store')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='core.store'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='staff', to='core.store'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['store', 'sale_date'], name='core_sale_store_i_e5a61c_idx'),
+        ),
+        migrations.AddField(
+            model_name='storestock',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='store_stock', to='core.product'),
+        ),
+        migrations.AddField(
+            model_name='storestock',
+            name='store',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='core.store'),
+        ),
+        migrations.AddIndex(
+            model_name='storestock',
+            index=models.Index(fields=['store', 'quantity'], name='core_stores_store_i_665cf4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='storestock',
+            constraint=models.UniqueConstraint(fields=('store', 'product'), name='unique_store_product'),
+        ),
+    ]
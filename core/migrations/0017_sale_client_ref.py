@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-19 10:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_stores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_ref',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='sale_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
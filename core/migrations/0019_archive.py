@@ -0,0 +1,90 @@
+# Generated by Django 6.0 on 2026-10-19 10:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_audit_log_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedExpense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.CharField(choices=[('Rent', 'Shop Rent'), ('Salary', 'Staff Salary'), ('Bills', 'Electricity/Water Bills'), ('Maintenance', 'Repairs & Maintenance'), ('Other', 'Other')], max_length=50)),
+                ('date_added', models.DateField(db_index=True)),
+                ('payroll_month', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedSale',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cost_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sale_date', models.DateTimeField(db_index=True)),
+                ('client_ref', models.CharField(blank=True, max_length=64, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cogs', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_date'], name='core_sale_sale_da_05f5fa_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='added_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.staff'),
+        ),
+        migrations.AddField(
+            model_name='archivedsale',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.customer'),
+        ),
+        migrations.AddField(
+            model_name='archivedsale',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_sales', to='core.product'),
+        ),
+        migrations.AddField(
+            model_name='archivedsale',
+            name='sold_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedsale',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.store'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlysummary',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_summary_month'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-19 10:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseBudget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Rent', 'Shop Rent'), ('Salary', 'Staff Salary'), ('Bills', 'Electricity/Water Bills'), ('Maintenance', 'Repairs & Maintenance'), ('Other', 'Other')], max_length=50, unique=True)),
+                ('monthly_limit', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['date_added', 'id'], name='core_expens_date_ad_ce3b62_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['category', 'date_added'], name='core_expens_categor_683585_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 11:40
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+OLD_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+NEW_BACKEND = 'core.auth.CachedModelBackend'
+
+
+def move_sessions_to_cached_backend(apps, schema_editor):
+    # ModelBackend is no longer listed in AUTHENTICATION_BACKENDS; point the
+    # sessions that logged in through it at its subclass so nobody is logged out
+    from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.cache import caches
+
+    Session = apps.get_model('sessions', 'Session')
+    store = SessionStore()
+    moved = []
+    for session in Session.objects.filter(expire_date__gt=timezone.now()).iterator():
+        data = store.decode(session.session_data)
+        if data.get('_auth_user_backend') == OLD_BACKEND:
+            data['_auth_user_backend'] = NEW_BACKEND
+            Session.objects.filter(pk=session.pk).update(session_data=store.encode(data))
+            moved.append(session.pk)
+    # cached_db sessions: drop the stale cached copies so the next read comes from the table
+    caches[settings.SESSION_CACHE_ALIAS].delete_many([KEY_PREFIX + key for key in moved])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_job_heartbeat'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_sessions_to_cached_backend, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,30 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 
 
+# Soft delete: "deleted" rows keep their history (sales point at them) but
+# disappear from Model.objects. all_objects still sees everything.
+class ActiveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 # 1. Category Model
 class Category(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    def soft_delete(self):
+        # Products go with their category, but their sales stay
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+        Product.objects.filter(category=self).update(deleted_at=self.deleted_at, sku=None)
 
     def __str__(self):
         return self.name
@@ -14,12 +33,47 @@ class Category(models.Model):
 # 2. Product Model
 class Product(models.Model):
     name = models.CharField(max_length=200)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     stock_quantity = models.IntegerField()
     # We are using image_url because it's simpler and works with your current templates
     image_url = models.CharField(max_length=500, blank=True)
+    # Barcode / SKU printed on the item; scanned at the till (see core/barcodes.py)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    # Content hash of the locally stored copy of the image (see core/images.py)
+    image_hash = models.CharField(max_length=24, blank=True, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # Inventory pages seek on (sort column, id), see core/pagination.py
+        indexes = [
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['stock_quantity', 'id']),
+        ]
+
+    def _thumbnail(self, size):
+        if not self.image_hash:
+            return ''
+        return reverse('product_image', args=[f"{self.image_hash}_{size}.jpg"])
+
+    @property
+    def thumb_sm(self):
+        return self._thumbnail('sm')
+
+    @property
+    def thumb_lg(self):
+        return self._thumbnail('lg')
+
+    def soft_delete(self):
+        # Free the barcode so it can be given to a replacement product
+        self.deleted_at = timezone.now()
+        self.sku = None
+        self.save(update_fields=['deleted_at', 'sku'])
 
     def __str__(self):
         return self.name
@@ -27,11 +81,22 @@ class Product(models.Model):
 
 # 3. Sale Model (This is the new feature!)
 class Sale(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)  # products are soft-deleted instead
     quantity = models.PositiveIntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
-    sale_date = models.DateTimeField(auto_now_add=True)
+    sale_date = models.DateTimeField(default=timezone.now)  # offline tills send their own time
     sold_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Optional: set when the cashier identifies the customer at the till
+    customer = models.ForeignKey('Customer', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales')
+    # Branch the sale was rung up in (empty for sales made before branches existed)
+    store = models.ForeignKey('Store', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales')
+    # Idempotency key generated by the till, so a retried sync can't record a sale twice
+    client_ref = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        # Branch dashboards only ever read their own store's recent sales;
+        # reports and the archiver range-scan on sale_date alone
+        indexes = [models.Index(fields=['store', 'sale_date']), models.Index(fields=['sale_date'])]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} sold by {self.sold_by.username}"
@@ -56,17 +121,49 @@ class Expense(models.Model):
     # We track who added the expense
     added_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    # Filled in for salary rows created by the monthly payroll run (core/payroll.py)
+    staff = models.ForeignKey('Staff', on_delete=models.SET_NULL, null=True, blank=True, related_name='salary_expenses')
+    payroll_month = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One salary row per person per month, so re-running payroll is harmless
+            models.UniqueConstraint(fields=['staff', 'payroll_month'], condition=models.Q(staff__isnull=False),
+                                    name='unique_salary_per_staff_month'),
+        ]
+        # The expense list is paged newest first and filtered by category
+        indexes = [
+            models.Index(fields=['date_added', 'id']),
+            models.Index(fields=['category', 'date_added']),
+        ]
+
     def __str__(self):
         return f"{self.title} - ₹{self.amount}"
+
+
+class ExpenseBudget(models.Model):
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES, unique=True)
+    monthly_limit = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.get_category_display()} - ₹{self.monthly_limit}/month"
     
 #5 customer models
 class Customer(models.Model):
     name = models.CharField(max_length=100)
-    phone = models.CharField(max_length=15)
+    phone = models.CharField(max_length=15, db_index=True)  # looked up at the till
     email = models.EmailField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     date_added = models.DateTimeField(auto_now_add=True)
 
+    # Running totals, kept up to date by core.sales.record_sale
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    visit_count = models.PositiveIntegerField(default=0)
+    last_purchase = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-total_spent', 'id'])]
+
     def __str__(self):
         return self.name
     
@@ -78,6 +175,10 @@ class Staff(models.Model):
     phone = models.CharField(max_length=15)
     salary = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     date_hired = models.DateField(auto_now_add=True)
+    # Login account used at the till, so Sale.sold_by can be traced back to a person
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='staff_profile')
+    # Home branch; the till opens on this store by default
+    store = models.ForeignKey('Store', on_delete=models.SET_NULL, null=True, blank=True, related_name='staff')
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -92,4 +193,170 @@ class Supplier(models.Model):
     date_added = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.company_name
\ No newline at end of file
+        return self.company_name
+
+#8 branches and per-branch stock
+class Store(models.Model):
+    name = models.CharField(max_length=100)
+    code = models.CharField(max_length=10, unique=True)  # e.g., "MAIN", "BR2"
+    address = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class StoreStock(models.Model):
+    # Product.stock_quantity stays the shop-wide total; these rows split it by branch
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='stock')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='store_stock')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['store', 'product'], name='unique_store_product')]
+        # Low-stock alerts per branch
+        indexes = [models.Index(fields=['store', 'quantity'])]
+
+    def __str__(self):
+        return f"{self.product} @ {self.store}: {self.quantity}"
+
+
+class StockTransfer(models.Model):
+    from_store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='transfers_out')
+    to_store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='transfers_in')
+    lines = models.JSONField(default=dict)  # {product_id: quantity}
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.from_store} -> {self.to_store} ({len(self.lines)} products)"
+
+
+#9 per-staff daily sales rollup
+class StaffSalesDaily(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    sale_count = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'day'], name='unique_staff_sales_day')]
+        indexes = [models.Index(fields=['day'])]
+
+    def __str__(self):
+        return f"{self.user} {self.day}: ₹{self.revenue}"
+
+
+#10 audit trail (written by core/audit.py)
+class AuditLog(models.Model):
+    ACTION_CHOICES = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    model = models.CharField(max_length=50)  # e.g., "core.product"
+    object_id = models.CharField(max_length=40)
+    object_repr = models.CharField(max_length=200)
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id']),
+            models.Index(fields=['timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model} #{self.object_id}"
+
+
+#11 background jobs
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)  # e.g., "export_sales", see core/jobs.py
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # bumped by the worker while it runs
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Workers poll for the oldest queued job, so keep that lookup on an index
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, int(self.progress * 100 / self.total))
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+#12 archive of closed years (written by core/archive.py)
+class MonthlySummary(models.Model):
+    """Frozen P&L totals of the sales/expenses moved to the archive tables."""
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cogs = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sale_count = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['year', 'month'], name='unique_summary_month')]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}"
+
+
+class ArchivedSale(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # same id it had in Sale
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_sales')
+    quantity = models.PositiveIntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)  # unit cost when archived
+    sale_date = models.DateTimeField(db_index=True)
+    sold_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    store = models.ForeignKey(Store, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    client_ref = models.CharField(max_length=64, null=True, blank=True)
+
+    def __str__(self):
+        return f"Archived sale #{self.pk}"
+
+
+class ArchivedExpense(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # same id it had in Expense
+    title = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    date_added = models.DateField(db_index=True)
+    added_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    staff = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    payroll_month = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Archived expense #{self.pk}"
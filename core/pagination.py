@@ -0,0 +1,64 @@
+"""
+Keyset ("seek") pagination.
+
+Instead of OFFSET, each page starts after the last row of the previous one,
+so page 800 of a big catalogue costs the same as page 1 and rows don't shift
+when products are added while someone is paging.
+"""
+import base64
+import json
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (BinasciiError, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    return values
+
+
+def _value(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def keyset_page(queryset, field, descending=False, cursor=None, per_page=50):
+    """Return (rows, next_cursor) for one page ordered by (field, pk).
+
+    `field` may follow relations (e.g. 'category__name'); pk breaks ties so
+    the ordering is stable. next_cursor is None on the last page.
+    """
+    op = 'lt' if descending else 'gt'
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+
+    after = decode_cursor(cursor)
+    if after is not None:
+        value, pk = after
+        try:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk}))
+        except (ValidationError, ValueError, TypeError):
+            pass  # a hand-edited cursor: start from the first page
+
+    rows = list(queryset[:per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor([_value(last, field), last.pk])
@@ -0,0 +1,26 @@
+"""
+Monthly payroll.
+
+Creates one 'Salary' expense per paid staff member for a month. Rows are
+keyed on (staff, payroll_month), so running it twice for the same month
+only adds people who were missing the first time.
+"""
+from . import audit
+from .models import Expense, Staff
+
+
+def run_payroll(month, user):
+    """Book salaries for the month containing `month`; returns rows created."""
+    month = month.replace(day=1)
+    staff = Staff.objects.filter(salary__gt=0)
+    rows = [
+        Expense(title=f"Salary - {member} ({month:%b %Y})", amount=member.salary, category='Salary',
+                date_added=month, added_by=user, staff=member, payroll_month=month)
+        for member in staff
+    ]
+    before = Expense.objects.filter(payroll_month=month).count()
+    Expense.objects.bulk_create(rows, ignore_conflicts=True)
+    created = Expense.objects.filter(payroll_month=month).count() - before
+    if created:
+        audit.log_event('create', Expense, object_repr=f"Payroll {month:%b %Y}", changes={'created': created}, user=user)
+    return created
@@ -0,0 +1,120 @@
+"""
+On-demand request profiling.
+
+With PROFILING_ENABLED on, a staff user can add ?profile=1 to any URL (or
+send an "X-Profile: 1" header) to run that one request under cProfile with
+every SQL statement timed and EXPLAINed. The report is written to
+PRIVATE_FILES_ROOT/profiles/ (it holds SQL with its parameters, so only
+the staff-only profile_report view serves it, under an unguessable name)
+and its link comes back in the X-Profile-Report response header; the
+matching .prof file opens in pstats/snakeviz.
+
+With the setting off, ProfilingMiddleware removes itself at startup
+(MiddlewareNotUsed), so normal requests pay nothing.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+REPORT_NAME_RE = re.compile(r'^[0-9]{8}_[0-9]{6}_[0-9]+_[0-9a-f]{32}_[a-z0-9_]+\.(txt|prof)$')
+TOP_FUNCTIONS = 40
+
+
+def report_dir():
+    folder = os.path.join(settings.PRIVATE_FILES_ROOT, 'profiles')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() hook that keeps sql, params and duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, many, time.perf_counter() - start))
+
+
+def explain(sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:  # a plan is nice to have, never worth failing the request
+        return f"(EXPLAIN failed: {e})"
+
+
+def write_report(request, response, profiler, recorder, elapsed):
+    view = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+    stem = (f"{timezone.now():%Y%m%d_%H%M%S}_{os.getpid()}_{uuid.uuid4().hex}_"
+            f"{re.sub(r'[^a-z0-9]+', '_', view.lower())}")
+    folder = report_dir()
+
+    sql_time = sum(q[3] for q in recorder.queries)
+    counts = {}
+    for sql, *_ in recorder.queries:
+        counts[sql] = counts.get(sql, 0) + 1
+
+    out = io.StringIO()
+    out.write(f"{request.method} {request.get_full_path()} -> {response.status_code}\n")
+    out.write(f"view: {view}   user: {request.user}   at: {timezone.now():%Y-%m-%d %H:%M:%S}\n")
+    out.write(f"total: {elapsed * 1000:.1f} ms   sql: {len(recorder.queries)} queries, {sql_time * 1000:.1f} ms\n\n")
+
+    out.write("=== SQL (slowest first) ===\n")
+    for sql, params, many, duration in sorted(recorder.queries, key=lambda q: q[3], reverse=True):
+        repeat = f"   (run {counts[sql]}x in this request)" if counts[sql] > 1 else ''
+        out.write(f"\n[{duration * 1000:.2f} ms]{repeat}\n{sql}\nparams: {params!r}\n")
+        plan = explain(sql, params) if not many else ''
+        if plan:
+            out.write(f"plan:\n{plan}\n")
+
+    out.write(f"\n=== Python (top {TOP_FUNCTIONS} by cumulative time) ===\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    stats.dump_stats(os.path.join(folder, f"{stem}.prof"))
+
+    with open(os.path.join(folder, f"{stem}.txt"), 'w') as fh:
+        fh.write(out.getvalue())
+    return f"{stem}.txt"
+
+
+class ProfilingMiddleware:
+    """Goes after AuthenticationMiddleware: only staff may trigger a profile."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wanted = request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+        if not (wanted and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = profiler.runcall(self.get_response, request)
+        elapsed = time.perf_counter() - start
+
+        name = write_report(request, response, profiler, recorder, elapsed)
+        response['X-Profile-Report'] = reverse('profile_report', args=[name])
+        return response
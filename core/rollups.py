@@ -0,0 +1,63 @@
+"""
+Pre-aggregated sales tables.
+
+Leaderboards read these small per-day rows instead of scanning Sale. They
+are bumped inside the sale transaction by core.sales.record_sale, and can
+be rebuilt from scratch with the 'rebuild_staff_sales' job.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedSale, Sale, StaffSalesDaily
+
+
+def bump_staff_sales(sale):
+    day = timezone.localdate(sale.sale_date)
+    changes = {
+        'sale_count': F('sale_count') + 1,
+        'items_sold': F('items_sold') + sale.quantity,
+        'revenue': F('revenue') + sale.total_price,
+    }
+    if StaffSalesDaily.objects.filter(user_id=sale.sold_by_id, day=day).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            StaffSalesDaily.objects.create(user_id=sale.sold_by_id, day=day, sale_count=1,
+                                           items_sold=sale.quantity, revenue=sale.total_price)
+    except IntegrityError:
+        # Another till created today's row first
+        StaffSalesDaily.objects.filter(user_id=sale.sold_by_id, day=day).update(**changes)
+
+
+def _daily_totals(model):
+    return (model.objects.annotate(day=TruncDate('sale_date', tzinfo=timezone.get_current_timezone()))
+            .values('sold_by', 'day')
+            .annotate(sale_count=Count('id'), items_sold=Sum('quantity'), revenue=Sum('total_price')))
+
+
+@transaction.atomic
+def rebuild_staff_sales():
+    # Archived years count too, or a rebuild would wipe their leaderboards
+    merged = {}
+    for t in list(_daily_totals(Sale)) + list(_daily_totals(ArchivedSale).filter(sold_by__isnull=False)):
+        key = (t['sold_by'], t['day'])
+        if key in merged:
+            for field in ('sale_count', 'items_sold', 'revenue'):
+                merged[key][field] += t[field]
+        else:
+            merged[key] = t
+    StaffSalesDaily.objects.all().delete()
+    rows = [StaffSalesDaily(user_id=t['sold_by'], day=t['day'], sale_count=t['sale_count'],
+                            items_sold=t['items_sold'], revenue=t['revenue']) for t in merged.values()]
+    StaffSalesDaily.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def staff_leaderboard(start, end):
+    """Sales per user between two dates (inclusive), best first."""
+    return (StaffSalesDaily.objects.filter(day__range=(start, end))
+            .values('user', 'user__username', 'user__staff_profile__first_name', 'user__staff_profile__last_name')
+            .annotate(revenue=Sum('revenue'), items_sold=Sum('items_sold'), sale_count=Sum('sale_count'))
+            .order_by('-revenue'))
@@ -0,0 +1,206 @@
+"""
+Recording sales.
+
+Every code path that sells stock goes through record_sale(), so the stock
+decrement, the Sale row, the customer's running totals and the staff
+rollup are written together in one transaction.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Customer, Product, Sale, StoreStock
+from .rollups import bump_staff_sales
+from .stores import all_stores
+
+
+class OutOfStock(Exception):
+    def __init__(self, product, quantity):
+        super().__init__(f"Not enough stock of {product.name} to sell {quantity}.")
+        self.product = product
+        self.quantity = quantity
+
+
+class BranchRequired(Exception):
+    def __init__(self):
+        super().__init__("Pick the branch you are selling from first.")
+
+
+def normalize_phone(phone):
+    """Keep digits and a leading '+', so '98765 43210' matches '9876543210'."""
+    phone = (phone or '').strip()
+    digits = ''.join(ch for ch in phone if ch.isdigit())
+    return f"+{digits}" if phone.startswith('+') else digits
+
+
+def find_customer(phone):
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    return Customer.objects.filter(phone=phone).order_by('id').first()
+
+
+def _check_branch(store):
+    # Once branches exist all stock lives in one, and a sale from "All
+    # branches" would only lower the shop-wide total and leave the branch
+    # rows claiming stock that has been sold
+    if store is None and all_stores():
+        raise BranchRequired
+
+
+def _take_stock(product, quantity, store, force=False):
+    """Decrement stock. Unless forced, only if there is enough; returns whether it did."""
+    if store is not None:
+        rows = StoreStock.objects.filter(store=store, product=product)
+    else:
+        rows = Product.all_objects.filter(pk=product.pk)
+    field = 'quantity' if store is not None else 'stock_quantity'
+
+    if not force:
+        # Conditional UPDATE: two tills selling the last unit can't both succeed
+        rows = rows.filter(**{f'{field}__gte': quantity})
+    taken = rows.update(**{field: F(field) - quantity})
+    if not taken and force and store is not None:
+        StoreStock.objects.create(store=store, product=product, quantity=-quantity)
+        taken = True
+    if taken and store is not None:
+        # Keep the shop-wide total in step with the branch
+        Product.all_objects.filter(pk=product.pk).update(stock_quantity=F('stock_quantity') - quantity)
+    return bool(taken)
+
+
+@transaction.atomic
+def record_sale(product, quantity, user, customer=None, new_visit=True, store=None,
+                sale_date=None, client_ref=None, allow_oversell=False):
+    """Sell `quantity` of `product`; raises OutOfStock if there isn't enough.
+
+    With a store, the branch's own stock must cover the sale. Once any
+    branch exists a store is required (BranchRequired otherwise). Set
+    new_visit=False for the second and later lines of one checkout so the
+    customer's visit count goes up once per basket, not once per item.
+
+    sale_date/client_ref/allow_oversell are for sales synced from an offline
+    till: the sale already happened, so it may be recorded even when stock
+    says otherwise (the returned sale then has .oversold set).
+    """
+    _check_branch(store)
+    oversold = False
+    if not _take_stock(product, quantity, store):
+        if not allow_oversell:
+            raise OutOfStock(product, quantity)
+        _take_stock(product, quantity, store, force=True)
+        oversold = True
+    product.stock_quantity -= quantity
+
+    sale = Sale.objects.create(product=product, quantity=quantity, total_price=product.price * quantity,
+                               sold_by=user, customer=customer, store=store, client_ref=client_ref,
+                               sale_date=sale_date or timezone.now())
+    sale.oversold = oversold
+    bump_staff_sales(sale)
+    if customer is not None:
+        Customer.objects.filter(pk=customer.pk).update(
+            total_spent=F('total_spent') + sale.total_price,
+            visit_count=F('visit_count') + (1 if new_visit else 0),
+            # Synced sales can arrive out of order; keep the latest date
+            last_purchase=Greatest(Coalesce('last_purchase', Value(sale.sale_date)), Value(sale.sale_date)),
+        )
+    return sale
+
+
+# --- OFFLINE TILL SYNC ---
+MAX_SYNC_BATCH = 500
+
+
+def _parse_sold_at(value):
+    if not value:
+        return None
+    sold_at = parse_datetime(str(value))
+    if sold_at is None:
+        raise ValueError
+    if timezone.is_naive(sold_at):
+        sold_at = timezone.make_aware(sold_at)
+    return sold_at
+
+
+def apply_sale_batch(lines, user, store=None, accept_oversell=False):
+    """Record a batch of sales queued by an offline till, in one transaction.
+
+    Each line is a dict: ref (client-generated idempotency key), product
+    (id, preferred) or sku, quantity, and optionally sold_at (ISO time),
+    customer_phone and basket (lines sharing a basket count as one customer
+    visit).
+
+    Returns one result per line, in order, with status 'applied', 'duplicate'
+    (ref already recorded) or 'rejected' (with an error code). With
+    accept_oversell, a line the stock can't cover is still recorded - the
+    goods have already left the shop - and flagged with conflict='oversold'.
+    Raises BranchRequired, before recording anything, if a store is needed.
+    """
+    _check_branch(store)
+    refs = [str(line.get('ref') or '')[:64] for line in lines]
+    skus = {str(line['sku']) for line in lines if line.get('sku')}
+    ids = {line['product'] for line in lines if isinstance(line.get('product'), int)}
+    phones = {normalize_phone(line.get('customer_phone')) for line in lines} - {''}
+
+    results = []
+    with transaction.atomic():
+        # One query each for duplicates, products and customers, however long the batch
+        done = dict(Sale.objects.filter(client_ref__in=[r for r in refs if r]).values_list('client_ref', 'id'))
+        # all_objects: a till may have sold a product before it was deleted
+        products = {p.pk: p for p in Product.all_objects.filter(Q(sku__in=skus) | Q(pk__in=ids))}
+        by_sku = {p.sku: p for p in products.values() if p.sku}
+        customers = {}
+        for customer in Customer.objects.filter(phone__in=phones).order_by('-id'):
+            customers[customer.phone] = customer  # lowest id wins, like find_customer()
+        baskets = set()
+
+        for ref, line in zip(refs, lines):
+            result = {'ref': ref}
+            results.append(result)
+            if not ref:
+                result.update(status='rejected', error='missing_ref')
+                continue
+            if ref in done:
+                result.update(status='duplicate', sale=done[ref])
+                continue
+
+            # The id wins: a deleted product's barcode is freed and may now be another product's
+            if isinstance(line.get('product'), int):
+                product = products.get(line['product'])
+            else:
+                product = by_sku.get(str(line.get('sku')))
+            quantity = line.get('quantity')
+            try:
+                sold_at = _parse_sold_at(line.get('sold_at'))
+            except ValueError:
+                result.update(status='rejected', error='invalid_date')
+                continue
+            if product is None:
+                result.update(status='rejected', error='unknown_product')
+                continue
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                result.update(status='rejected', error='invalid_quantity')
+                continue
+
+            basket = line.get('basket')
+            new_visit = basket is None or basket not in baskets
+            baskets.add(basket)
+            try:
+                sale = record_sale(product, quantity, user,
+                                   customer=customers.get(normalize_phone(line.get('customer_phone'))),
+                                   new_visit=new_visit, store=store, sale_date=sold_at, client_ref=ref,
+                                   allow_oversell=accept_oversell)
+            except OutOfStock:
+                result.update(status='rejected', error='insufficient_stock')
+                continue
+            except IntegrityError:
+                # Same ref committed by a concurrent sync between our check and insert
+                result.update(status='duplicate')
+                continue
+            done[ref] = sale.pk
+            result.update(status='applied', sale=sale.pk)
+            if sale.oversold:
+                result['conflict'] = 'oversold'
+    return results
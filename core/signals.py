@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import audit, barcodes
+from .auth import forget_user
+from .models import Category, Product, Store
+from .stores import clear_store_cache
+
+audit.connect()
+
+
+# Category.soft_delete() clears its products' SKUs with a queryset update,
+# which sends no Product signals
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def product_changed(sender, **kwargs):
+    barcodes.clear_cache()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Store)
+def store_changed(sender, **kwargs):
+    clear_store_cache()
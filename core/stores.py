@@ -0,0 +1,127 @@
+"""
+Branches.
+
+Each branch keeps its own StoreStock rows; Product.stock_quantity remains
+the shop-wide total (sum over branches plus anything never assigned to a
+branch). Sales, receipts and transfers keep both in step.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from . import audit
+from .models import Product, Staff, Store, StoreStock, StockTransfer
+
+SESSION_KEY = 'store_id'
+STORES_CACHE_KEY = 'stores:all'
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # shortages: {product_id: quantity missing}
+        super().__init__(f"Not enough stock for {len(shortages)} product(s).")
+        self.shortages = shortages
+
+
+def all_stores():
+    """Every branch by name. Cached: the header switcher lists them on every page.
+
+    core/signals.py clears the cache when a branch is saved or deleted.
+    """
+    stores = cache.get(STORES_CACHE_KEY)
+    if stores is None:
+        stores = list(Store.objects.order_by('name'))
+        cache.set(STORES_CACHE_KEY, stores, None)
+    return stores
+
+
+def clear_store_cache():
+    cache.delete(STORES_CACHE_KEY)
+
+
+def current_store(request):
+    """The branch this request works in, or None for "all branches".
+
+    Chosen with the store switcher (kept in the session); a staff member's
+    home branch is used until they pick one.
+    """
+    if not hasattr(request, '_current_store'):
+        if SESSION_KEY not in request.session and request.user.is_authenticated:
+            home = Staff.objects.filter(user_id=request.user.pk).values_list('store_id', flat=True).first()
+            request.session[SESSION_KEY] = home or 0
+        store_id = request.session.get(SESSION_KEY)
+        request._current_store = next((s for s in all_stores() if s.pk == store_id), None) if store_id else None
+    return request._current_store
+
+
+def parse_stock_lines(text):
+    """Parse "SKU-or-ID, quantity" lines into ({product_id: qty}, [errors])."""
+    wanted, errors = {}, []
+    for number, raw in enumerate(text.splitlines(), start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        code, _, qty = raw.replace('\t', ',').rpartition(',')
+        try:
+            qty = int(qty)
+        except ValueError:
+            qty = 0
+        if not code.strip() or qty <= 0:
+            errors.append(f"Line {number}: expected 'SKU, quantity'.")
+            continue
+        wanted[code.strip()] = wanted.get(code.strip(), 0) + qty
+
+    by_sku = dict(Product.objects.filter(sku__in=wanted).values_list('sku', 'id'))
+    ids = {int(c) for c in wanted if c not in by_sku and c.isdigit()}
+    known_ids = set(Product.objects.filter(pk__in=ids).values_list('id', flat=True))
+
+    lines = {}
+    for code, qty in wanted.items():
+        product_id = by_sku.get(code) or (int(code) if code.isdigit() and int(code) in known_ids else None)
+        if product_id is None:
+            errors.append(f"Unknown product '{code}'.")
+        else:
+            lines[product_id] = lines.get(product_id, 0) + qty
+    return lines, errors
+
+
+def _add_to_store(store, lines):
+    # Relative updates, so a sale decrementing the same row at the same time isn't lost
+    StoreStock.objects.bulk_create([StoreStock(store=store, product_id=product_id, quantity=0)
+                                    for product_id in lines], ignore_conflicts=True)
+    for product_id, qty in lines.items():
+        StoreStock.objects.filter(store=store, product_id=product_id).update(quantity=F('quantity') + qty)
+
+
+@transaction.atomic
+def receive_stock(store, lines, new_delivery=True):
+    """Put stock into a branch.
+
+    new_delivery=True for goods arriving from a supplier (the shop-wide total
+    goes up too); False to assign stock already counted in the total.
+    """
+    _add_to_store(store, lines)
+    if new_delivery:
+        for product_id, qty in lines.items():
+            Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') + qty)
+    audit.log('update', store, {'received': {str(k): v for k, v in lines.items()}, 'new_delivery': new_delivery})
+
+
+@transaction.atomic
+def transfer_stock(from_store, to_store, lines, user=None):
+    """Move stock between branches all-or-nothing; raises InsufficientStock."""
+    shortages = []
+    for product_id, qty in lines.items():
+        # Take only if there's enough, in the same statement as the check
+        taken = StoreStock.objects.filter(store=from_store, product_id=product_id, quantity__gte=qty).update(
+            quantity=F('quantity') - qty)
+        if not taken:
+            shortages.append(product_id)
+    if shortages:
+        have = dict(StoreStock.objects.filter(store=from_store, product_id__in=shortages)
+                    .values_list('product_id', 'quantity'))
+        raise InsufficientStock({pid: lines[pid] - have.get(pid, 0) for pid in shortages})
+
+    _add_to_store(to_store, lines)
+    return StockTransfer.objects.create(from_store=from_store, to_store=to_store,
+                                        lines={str(k): v for k, v in lines.items()}, created_by=user)
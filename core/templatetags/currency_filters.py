@@ -1,38 +1,66 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, localcontext
+from functools import lru_cache
+
 from django import template
 
 register = template.Library()
 
+PAISE = Decimal('0.01')
+
+
+def _to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        # repr() gives the shortest round-tripping string, so 0.1 stays 0.1
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+@lru_cache(maxsize=4096)
+def _format(amount):
+    # The default 28-digit precision can't hold paise on very large amounts
+    with localcontext(prec=max(28, amount.adjusted() + 3)):
+        amount = amount.quantize(PAISE, rounding=ROUND_HALF_UP)
+        whole, paise = f"{abs(amount):f}".split('.')
+
+    # Indian grouping: last 3 digits, then pairs (25,40,400)
+    if len(whole) > 3:
+        head, last_3 = whole[:-3], whole[-3:]
+        lead = len(head) % 2
+        groups = [head[:lead]] if lead else []
+        groups.extend(head[i:i + 2] for i in range(lead, len(head), 2))
+        whole = f"{','.join(groups)},{last_3}"
+
+    sign = '-' if amount < 0 else ''
+    return f"{sign}{whole}.{paise}"
+
+
+def format_rupees(value):
+    """Format one amount; returns the input unchanged if it isn't a number."""
+    if value is None:
+        return "0.00"
+    try:
+        amount = _to_decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return value
+    if not amount.is_finite():
+        return value
+    try:
+        return _format(amount)
+    except InvalidOperation:  # beyond what Decimal can represent at all
+        return value
+
+
+def format_rupees_many(values):
+    """Format a whole column at once, e.g. for CSV exports or chart labels."""
+    return [format_rupees(v) for v in values]
+
+
 @register.filter
 def rupees(value):
     """
     Converts a number like 2540400 into 25,40,400.00
     Usage in HTML: {{ value|rupees }}
     """
-    try:
-        if value is None:
-            return "0.00"
-        
-        # Convert to float to handle decimals, then to string
-        value = float(value)
-        s = "{:.2f}".format(value)
-        parts = s.split('.')
-        integer_part = parts[0]
-        decimal_part = parts[1]
-        
-        if len(integer_part) <= 3:
-            return s
-            
-        last_3 = integer_part[-3:]
-        rest = integer_part[:-3]
-        
-        # Logic to split the rest into pairs of 2
-        vals = []
-        for i in range(len(rest) - 1, -1, -2):
-            start = max(i - 1, 0)
-            vals.append(rest[start:i+1])
-        
-        new_rest = ",".join(vals[::-1])
-        return f"{new_rest},{last_3}.{decimal_part}"
-        
-    except (ValueError, TypeError):
-        return value
\ No newline at end of file
+    return format_rupees(value)
@@ -1,3 +1,682 @@
-from django.test import TestCase
+import datetime
+import http.server
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import barcodes, images, jobs
+from .archive import archive_year, monthly_figures
+from .expenses import category_breakdown
+from .models import (ArchivedExpense, ArchivedSale, AuditLog, Category, Customer, Expense, ExpenseBudget, Job,
+                     MonthlySummary, Product, Sale, Staff, StaffSalesDaily, Store, StoreStock)
+from .pagination import encode_cursor
+from .payroll import run_payroll
+from .rollups import bump_staff_sales, rebuild_staff_sales, staff_leaderboard
+from .sales import find_customer, normalize_phone, record_sale
+from .stores import InsufficientStock, clear_store_cache, receive_stock, transfer_stock
+from .templatetags.currency_filters import format_rupees_many, rupees
+
+
+class RupeesFilterTests(SimpleTestCase):
+    def test_indian_grouping(self):
+        self.assertEqual(rupees(2540400), "25,40,400.00")
+        self.assertEqual(rupees(Decimal('123456789.5')), "12,34,56,789.50")
+        self.assertEqual(rupees(999), "999.00")
+
+    def test_decimal_is_exact(self):
+        # float() would turn this into 10000000000000000.00
+        self.assertEqual(rupees(Decimal('9999999999999999.99')), "9,99,99,99,99,99,99,999.99")
+        self.assertEqual(rupees(Decimal('0.005')), "0.01")
+        self.assertEqual(rupees(Decimal('1E+30')), "10,00,00,00,00,00,00,00,00,00,00,00,00,00,000.00")
+
+    def test_negative_and_bad_values(self):
+        self.assertEqual(rupees(Decimal('-1234567')), "-12,34,567.00")
+        self.assertEqual(rupees(None), "0.00")
+        self.assertEqual(rupees("n/a"), "n/a")
+
+    def test_bulk(self):
+        self.assertEqual(format_rupees_many([1000, 0.1]), ["1,000.00", "0.10"])
+
+
+class SoftDeleteAuditTests(TransactionTestCase):
+    # Audit entries are queued with on_commit, so real commits are needed
+    def setUp(self):
+        self.user = User.objects.create_superuser('boss', password='pw')
+        self.category = Category.objects.create(name='Snacks')
+        self.product = Product.objects.create(name='Chips', category=self.category, price=20,
+                                              stock_quantity=10, sku='CHP-1')
+        record_sale(self.product, 2, self.user)
+        self.client.force_login(self.user)
+
+    def test_deleting_category_keeps_sales(self):
+        self.client.get(reverse('delete_category', args=[self.category.pk]))
+        self.assertFalse(Product.objects.filter(pk=self.product.pk).exists())
+        product = Product.all_objects.get(pk=self.product.pk)
+        self.assertIsNotNone(product.deleted_at)
+        self.assertIsNone(product.sku)
+        self.assertEqual(Sale.objects.filter(product=product).count(), 1)
+
+    def test_request_entries_are_stamped_with_user(self):
+        self.client.get(reverse('delete_product', args=[self.product.pk]))
+        entry = AuditLog.objects.latest('id')
+        self.assertEqual((entry.action, entry.model, entry.user), ('delete', 'core.product', self.user))
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('till1', password='pw')
+        self.client.force_login(self.user)
+
+    def test_till_request_skips_session_and_user_queries(self):
+        self.client.get(reverse('till'))  # fills the caches
+        with self.assertNumQueries(0):
+            self.client.get(reverse('till'))
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.get(reverse('till'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('till')).status_code, 302)
+
+    def test_failed_login_tries_one_backend(self):
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate', autospec=True,
+                        return_value=None) as authenticate:
+            self.assertFalse(self.client.login(username='till1', password='wrong'))
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_old_sessions_survive_the_backend_change(self):
+        from django.apps import apps
+        from django.contrib.sessions.backends.cached_db import SessionStore
+
+        session = SessionStore()
+        session.update({'_auth_user_id': str(self.user.pk), '_auth_user_hash': self.user.get_session_auth_hash(),
+                        '_auth_user_backend': 'django.contrib.auth.backends.ModelBackend'})
+        session.create()
+        migration = importlib.import_module('core.migrations.0022_cached_auth_sessions')
+        migration.move_sessions_to_cached_backend(apps, None)
+
+        self.client.logout()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        self.assertEqual(self.client.get(reverse('till')).status_code, 200)
+
+
+class ReportCachingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='pw')
+        category = Category.objects.create(name='Tea')
+        self.product = Product.objects.create(name='Green tea', category=category, price=50, stock_quantity=10)
+        self.client.force_login(self.user)
+
+    def test_unchanged_dashboard_is_not_resent(self):
+        etag = self.client.get(reverse('home'))['ETag']
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_sale_changes_etag(self):
+        etag = self.client.get(reverse('home'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            record_sale(self.product, 1, self.user)
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since_alone_is_not_enough(self):
+        # A date can't tell branches apart, so only the ETag may earn a 304
+        self.client.get(reverse('home'))
+        self.addCleanup(clear_store_cache)
+        self.client.post(reverse('switch_store'), {'store': Store.objects.create(name='Main', code='MAIN').pk})
+        response = self.client.get(reverse('home'), HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        private = tempfile.TemporaryDirectory()
+        self.addCleanup(private.cleanup)
+        self.enterContext(override_settings(PROFILING_ENABLED=True, PRIVATE_FILES_ROOT=private.name))
+        self.private = private.name
+
+    def test_staff_gets_report(self):
+        self.client.force_login(User.objects.create_user('ops', password='pw', is_staff=True))
+        link = self.client.get(reverse('profit_loss'), {'profile': '1'})['X-Profile-Report']
+        report = b''.join(self.client.get(link).streaming_content).decode()
+        self.assertIn('=== SQL (slowest first) ===', report)
+        self.assertIn('plan:', report)
+        # Kept out of MEDIA_ROOT, under a name that can't be guessed
+        self.assertIn(os.path.basename(link.rstrip('/')), os.listdir(os.path.join(self.private, 'profiles')))
+        self.assertRegex(link, r'_[0-9a-f]{32}_')
+
+    def test_ignored_for_other_users(self):
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        response = self.client.get(reverse('profit_loss'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Report', response)
+
+
+class ProductAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        category = Category.objects.create(name='Rice')
+        self.products = [Product.objects.create(name=f'Rice {kg}kg', category=category, price=price, stock_quantity=3)
+                         for kg, price in ((1, 80), (5, 390))]
+        record_sale(self.products[0], 1, User.objects.get(username='admin'))
+
+    def post_action(self, action, **data):
+        return self.client.post(reverse('admin:core_product_changelist'), {
+            'action': action, '_selected_action': [p.pk for p in self.products], 'index': 0, **data})
+
+    def test_bulk_price_and_stock(self):
+        self.post_action('adjust_price', apply='Apply', percent='10')
+        self.post_action('adjust_stock', apply='Apply', change='-5')
+        self.assertEqual(list(Product.objects.order_by('id').values_list('price', 'stock_quantity')),
+                         [(Decimal('88.00'), 0), (Decimal('429.00'), 0)])
+
+    def test_delete_is_soft_even_with_sales(self):
+        self.post_action('delete_selected', post='yes')
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(Product.all_objects.filter(deleted_at__isnull=False).count(), 2)
+
+    def test_customer_phone_is_normalised(self):
+        self.client.post(reverse('admin:core_customer_add'), {'name': 'Asha', 'phone': '98765 43210'})
+        self.assertEqual(find_customer('9876543210').name, 'Asha')
+
+    def test_sales_are_read_only_and_searchable(self):
+        sale = Sale.objects.get()
+        response = self.client.post(reverse('admin:core_sale_change', args=[sale.pk]), {'quantity': 50})
+        self.assertEqual(Sale.objects.get().quantity, 1)
+        self.assertEqual(response.status_code, 403)
+        self.products[0].sku = '890100'
+        self.products[0].save()
+        response = self.client.get(reverse('admin:core_sale_changelist'), {'q': '890100'})
+        self.assertEqual(list(response.context['cl'].result_list), [sale])
+
+
+class KeysetPaginationTests(TestCase):
+    def test_bad_cursor_shows_first_page(self):
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        bad = encode_cursor(['abc', 'x'])
+        for url, params in ((reverse('inventory'), {'sort': 'price'}), (reverse('sales_history'), {}),
+                            (reverse('expenses'), {})):
+            response = self.client.get(url, {**params, 'after': bad})
+            self.assertEqual(response.status_code, 200, url)
+
+
+class ProductImageTests(TestCase):
+    def test_internal_links_are_not_fetched(self):
+        for url in ('http://127.0.0.1:8000/admin/', 'http://169.254.169.254/latest/', 'file:///etc/passwd'):
+            with self.assertRaises(ValueError):
+                images.fetch_remote(url)
+
+    def test_connection_is_checked_not_just_dns(self):
+        # A rebinding host passes the DNS check, then resolves to loopback for the connect
+        server = http.server.HTTPServer(('127.0.0.1', 0), http.server.SimpleHTTPRequestHandler)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        with mock.patch.object(images, 'check_public_url'):
+            with self.assertRaisesMessage(ValueError, 'public host'):
+                images.fetch_remote(f'http://127.0.0.1:{server.server_port}/x.jpg')
+
+    def test_only_generated_sizes_are_served(self):
+        self.assertEqual(self.client.get(reverse('product_image', args=['0' * 24 + '_md.jpg'])).status_code, 404)
+
+    def test_upload_must_be_an_image(self):
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        category = Category.objects.create(name='Rice')
+        response = self.client.post(reverse('add_product'), {
+            'name': 'Basmati', 'category': category.pk, 'price': '120', 'stock_quantity': '1',
+            'image_upload': SimpleUploadedFile('rice.jpg', b'not an image', content_type='image/jpeg')})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image_upload', response.context['form'].errors)
+        self.assertFalse(Product.objects.exists())
+
+
+class BranchSaleTests(TestCase):
+    def setUp(self):
+        self.addCleanup(clear_store_cache)  # the rollback doesn't send delete signals
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))  # no home branch
+        category = Category.objects.create(name='Rice')
+        self.rice = Product.objects.create(name='Rice', sku='890100', category=category, price=80, stock_quantity=0)
+        self.main = Store.objects.create(name='Main', code='MAIN')
+        receive_stock(self.main, {self.rice.pk: 5})
+
+    def sell(self, quantity):
+        return self.client.post(reverse('sell_product', args=[self.rice.pk]), {'quantity': quantity})
+
+    def stock(self):
+        return (Product.objects.get(pk=self.rice.pk).stock_quantity,
+                StoreStock.objects.get(store=self.main, product=self.rice).quantity)
+
+    def test_no_selling_from_all_branches(self):
+        self.sell(5)
+        self.client.post(reverse('till_scan'), {'code': '890100', 'quantity': 1})
+        self.client.post(reverse('till_checkout'))
+        response = self.client.post(reverse('sync_sales'), {'sales': [{'ref': 'a1', 'sku': '890100', 'quantity': 1}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self.stock(), (5, 5))
+
+        # The same clerk in the branch can sell the 5 units once, not twice
+        self.client.post(reverse('switch_store'), {'store': self.main.pk})
+        self.sell(5)
+        self.sell(5)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(self.stock(), (0, 0))
+
+
+class StoreSwitchTests(TestCase):
+    def setUp(self):
+        self.addCleanup(clear_store_cache)  # the rollback doesn't send delete signals
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+
+    def test_bad_branch_id(self):
+        self.assertEqual(self.client.post(reverse('switch_store'), {'store': 'abc'}).status_code, 400)
+
+    def test_next_stays_on_site(self):
+        store = Store.objects.create(name='Main', code='MAIN')
+        response = self.client.post(reverse('switch_store'), {'store': store.pk, 'next': 'https://evil.example/'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        response = self.client.post(reverse('switch_store'), {'store': store.pk, 'next': '/inventory/'})
+        self.assertRedirects(response, '/inventory/', fetch_redirect_response=False)
+
+
+class StockMoveTests(TestCase):
+    def setUp(self):
+        self.addCleanup(clear_store_cache)  # the rollback doesn't send delete signals
+        category = Category.objects.create(name='Rice')
+        self.rice, self.dal = (Product.objects.create(name=name, category=category, price=100, stock_quantity=0)
+                               for name in ('Rice', 'Dal'))
+        self.main, self.annex = (Store.objects.create(name=name, code=name.upper()) for name in ('Main', 'Annex'))
+
+    def stock(self, store):
+        return dict(StoreStock.objects.filter(store=store).values_list('product_id', 'quantity'))
+
+    def test_receive_and_transfer(self):
+        receive_stock(self.main, {self.rice.pk: 5})
+        receive_stock(self.main, {self.rice.pk: 3, self.dal.pk: 2})
+        transfer_stock(self.main, self.annex, {self.rice.pk: 6})
+        self.assertEqual(self.stock(self.main), {self.rice.pk: 2, self.dal.pk: 2})
+        self.assertEqual(self.stock(self.annex), {self.rice.pk: 6})
+        self.assertEqual(Product.objects.get(pk=self.rice.pk).stock_quantity, 8)
+
+    def test_shortage_moves_nothing(self):
+        receive_stock(self.main, {self.rice.pk: 5, self.dal.pk: 1})
+        with self.assertRaises(InsufficientStock) as caught:
+            transfer_stock(self.main, self.annex, {self.rice.pk: 4, self.dal.pk: 3})
+        self.assertEqual(caught.exception.shortages, {self.dal.pk: 2})
+        self.assertEqual(self.stock(self.main), {self.rice.pk: 5, self.dal.pk: 1})
+        self.assertEqual(self.stock(self.annex), {})
+
+
+class CustomerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='pw')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Rice')
+        self.rice = Product.objects.create(name='Rice', category=category, price=80, stock_quantity=10)
+
+    def test_phone_matching(self):
+        self.assertEqual(normalize_phone(' 98765 43210 '), '9876543210')
+        self.assertEqual(normalize_phone('+91 98765-43210'), '+919876543210')
+        first = Customer.objects.create(name='Asha', phone='9876543210')
+        Customer.objects.create(name='Asha (dup)', phone='9876543210')
+        self.assertEqual(find_customer('98765 43210'), first)  # oldest wins
+        self.assertIsNone(find_customer(''))
+
+    def test_form_stores_normalised_phone(self):
+        self.client.post(reverse('customers'), {'name': 'Asha', 'phone': '98765 43210'})
+        self.assertEqual(Customer.objects.get().phone, '9876543210')
+
+    def test_sales_keep_running_totals(self):
+        customer = Customer.objects.create(name='Asha', phone='9876543210')
+        june, may = (timezone.make_aware(datetime.datetime(2026, month, 1)) for month in (6, 5))
+        record_sale(self.rice, 2, self.user, customer=customer, sale_date=june)
+        record_sale(self.rice, 1, self.user, customer=customer, new_visit=False, sale_date=june)
+        record_sale(self.rice, 1, self.user, customer=customer, sale_date=may)  # synced late
+        customer.refresh_from_db()
+        self.assertEqual((customer.total_spent, customer.visit_count, customer.last_purchase),
+                         (Decimal('320.00'), 2, june))
+
+    def test_lookup(self):
+        customer = Customer.objects.create(name='Asha', phone='9876543210', total_spent=500, visit_count=3)
+        response = self.client.get(reverse('customer_lookup'), {'phone': '98765 43210'})
+        self.assertEqual(response.json(), {'found': True, 'id': customer.pk, 'name': 'Asha',
+                                           'total_spent': '500.00', 'visit_count': 3})
+        self.assertEqual(self.client.get(reverse('customer_lookup'), {'phone': '111'}).status_code, 404)
+
+    def test_sort_by_spend(self):
+        low, high, tie = (Customer.objects.create(name=n, phone=str(i), total_spent=spent)
+                          for i, (n, spent) in enumerate((('Low', 10), ('High', 900), ('Tie', 10))))
+        response = self.client.get(reverse('customers'), {'sort': 'spend'})
+        self.assertEqual(list(response.context['customers']), [high, low, tie])
+
+
+class StaffSalesTests(TestCase):
+    def setUp(self):
+        self.asha = User.objects.create_user('asha', password='pw')
+        self.ravi = User.objects.create_user('ravi', password='pw')
+        Staff.objects.create(first_name='Asha', last_name='Rao', phone='1', salary=20000, user=self.asha)
+        category = Category.objects.create(name='Rice')
+        self.rice = Product.objects.create(name='Rice', category=category, price=80, stock_quantity=100)
+        self.today = timezone.localdate()
+
+    def rollup(self):
+        return sorted(StaffSalesDaily.objects.values_list('user__username', 'day', 'sale_count', 'items_sold',
+                                                          'revenue'))
+
+    def test_sales_bump_one_row_per_day(self):
+        record_sale(self.rice, 2, self.asha)
+        record_sale(self.rice, 1, self.asha)
+        record_sale(self.rice, 1, self.ravi)
+        self.assertEqual(self.rollup(), [('asha', self.today, 2, 3, Decimal('240.00')),
+                                         ('ravi', self.today, 1, 1, Decimal('80.00'))])
+
+    def test_bump_when_another_till_creates_the_row(self):
+        sale = record_sale(self.rice, 1, self.asha)
+        real_filter = StaffSalesDaily.objects.filter
+        calls = []
+
+        def racing_filter(*args, **kwargs):
+            # The first UPDATE finds nothing: the other till's INSERT lands just after it
+            calls.append(args)
+            return mock.Mock(update=mock.Mock(return_value=0)) if len(calls) == 1 else real_filter(*args, **kwargs)
+
+        with mock.patch.object(StaffSalesDaily.objects, 'filter', racing_filter):
+            bump_staff_sales(sale)
+        self.assertEqual(self.rollup(), [('asha', self.today, 2, 2, Decimal('160.00'))])
+
+    def test_rebuild_includes_archived_sales(self):
+        record_sale(self.rice, 2, self.asha)
+        record_sale(self.rice, 1, self.ravi)
+        live = self.rollup()
+        old_day = timezone.make_aware(datetime.datetime(2020, 3, 1, 12))
+        ArchivedSale.objects.create(id=999, product=self.rice, quantity=4, total_price=300, cost_price=50,
+                                    sale_date=old_day, sold_by=self.asha)
+        self.assertEqual(rebuild_staff_sales(), 3)
+        self.assertEqual(self.rollup(), sorted(live + [('asha', datetime.date(2020, 3, 1), 1, 4, Decimal('300.00'))]))
+
+    def test_leaderboard(self):
+        record_sale(self.rice, 1, self.asha)
+        record_sale(self.rice, 3, self.ravi)
+        board = list(staff_leaderboard(self.today, self.today))
+        self.assertEqual([(r['user__username'], r['revenue'], r['user__staff_profile__first_name']) for r in board],
+                         [('ravi', Decimal('240.00'), None), ('asha', Decimal('80.00'), 'Asha')])
+        self.assertEqual(list(staff_leaderboard(self.today + datetime.timedelta(days=1),
+                                                self.today + datetime.timedelta(days=7))), [])
+
+    def test_payroll_can_be_rerun(self):
+        june = datetime.date(2026, 6, 15)
+        self.assertEqual(run_payroll(june, self.asha), 1)
+        self.assertEqual(run_payroll(june, self.asha), 0)
+        Staff.objects.create(first_name='Ravi', last_name='K', phone='2', salary=18000, user=self.ravi)
+        Staff.objects.create(first_name='Volunteer', last_name='V', phone='3', salary=0)
+        self.assertEqual(run_payroll(june, self.asha), 1)  # only the new hire
+        self.assertEqual(Expense.objects.filter(category='Salary', payroll_month=datetime.date(2026, 6, 1)).count(), 2)
+
+
+class TillTests(TestCase):
+    def setUp(self):
+        barcodes.clear_cache()  # process-wide; rows from earlier tests are gone
+        self.user = User.objects.create_user('clerk', password='pw')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Rice')
+        self.rice = Product.objects.create(name='Rice', sku='890100', category=category, price=80, stock_quantity=5)
+        self.dal = Product.objects.create(name='Dal', sku='890200', category=category, price=120, stock_quantity=1)
+
+    def scan(self, code, quantity=1, **headers):
+        return self.client.post(reverse('till_scan'), {'code': code, 'quantity': quantity}, headers=headers)
+
+    def test_scan_form_and_json(self):
+        self.assertRedirects(self.scan('890100', 2), reverse('till'), fetch_redirect_response=False)
+        response = self.scan('890100', Accept='application/json')
+        self.assertEqual(response.json(), {'found': True, 'id': self.rice.pk, 'name': 'Rice', 'price': '80.00',
+                                           'quantity': 3})
+        self.assertEqual(self.scan('nope', Accept='application/json').status_code, 404)
+        self.assertEqual(self.client.session['till_cart'], {str(self.rice.pk): 3})
+
+    def test_checkout_is_one_visit(self):
+        customer = Customer.objects.create(name='Asha', phone='9876543210')
+        self.scan('890100', 2)
+        self.scan('890200')
+        self.client.post(reverse('till_checkout'), {'customer_phone': '98765 43210'})
+        customer.refresh_from_db()
+        self.assertEqual((customer.visit_count, customer.total_spent), (1, Decimal('280.00')))
+        self.assertEqual(self.client.session['till_cart'], {})
+
+    def test_checkout_rolls_back_whole_basket(self):
+        self.scan('890100', 2)
+        self.scan('890200', 2)  # only 1 in stock
+        self.client.post(reverse('till_checkout'))
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.rice.pk).stock_quantity, 5)
+        self.assertEqual(len(self.client.session['till_cart']), 2)  # kept so the clerk can fix it
+
+    def test_barcode_cache_cleared_on_save(self):
+        self.assertEqual(barcodes.product_for_code('890100').price, 80)
+        with self.assertNumQueries(0):
+            barcodes.product_for_code(' 890100 ')
+        self.rice.price = 85
+        self.rice.save()
+        self.assertEqual(barcodes.product_for_code('890100').price, 85)
+
+
+class SaleSyncTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        category = Category.objects.create(name='Rice')
+        self.rice = Product.objects.create(name='Rice', sku='890100', category=category, price=80, stock_quantity=2)
+
+    def sync(self, sales, **body):
+        response = self.client.post(reverse('sync_sales'), {'sales': sales, **body}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [(r['status'], r.get('error') or r.get('conflict')) for r in response.json()['results']]
+
+    def test_replay_is_idempotent(self):
+        batch = [{'ref': 'a1', 'sku': '890100', 'quantity': 1}]
+        self.assertEqual(self.sync(batch), [('applied', None)])
+        self.assertEqual(self.sync(batch), [('duplicate', None)])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.rice.pk).stock_quantity, 1)
+
+    def test_duplicate_ref_in_one_batch(self):
+        line = {'ref': 'a1', 'product': self.rice.pk, 'quantity': 1}
+        self.assertEqual(self.sync([line, line]), [('applied', None), ('duplicate', None)])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_oversell_rejected_or_accepted(self):
+        line = {'ref': 'a1', 'sku': '890100', 'quantity': 5}
+        self.assertEqual(self.sync([line]), [('rejected', 'insufficient_stock')])
+        self.assertEqual(self.sync([line], on_conflict='accept'), [('applied', 'oversold')])
+        # The goods are gone, so the count goes negative until someone recounts
+        self.assertEqual(Product.objects.get(pk=self.rice.pk).stock_quantity, -3)
+
+    def test_bad_lines_rejected_one_by_one(self):
+        results = self.sync([
+            {'sku': '890100', 'quantity': 1},
+            {'ref': 'b', 'sku': 'nope', 'quantity': 1},
+            {'ref': 'c', 'sku': '890100', 'quantity': 0},
+            {'ref': 'd', 'sku': '890100', 'quantity': 1, 'sold_at': 'yesterday'},
+            {'ref': 'e', 'sku': '890100', 'quantity': 1},
+        ])
+        self.assertEqual(results, [('rejected', 'missing_ref'), ('rejected', 'unknown_product'),
+                                   ('rejected', 'invalid_quantity'), ('rejected', 'invalid_date'),
+                                   ('applied', None)])
+        self.assertEqual(list(Sale.objects.values_list('client_ref', flat=True)), ['e'])
+
+    def test_product_deleted_before_sync(self):
+        self.rice.soft_delete()
+        self.assertEqual(self.sync([{'ref': 'a1', 'product': self.rice.pk, 'sku': '890100', 'quantity': 1}]),
+                         [('applied', None)])
+
+
+class ExpenseTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_superuser('owner', password='pw')
+        for title, category, amount, day in (('March rent', 'Rent', 1000, (2026, 3, 5)),
+                                             ('January rent', 'Rent', 800, (2026, 1, 10)),
+                                             ('Power', 'Bills', 300, (2026, 3, 20))):
+            Expense.objects.create(title=title, category=category, amount=amount, added_by=self.owner,
+                                   date_added=datetime.date(*day))
+
+    def test_breakdown_with_budgets_and_trend(self):
+        ExpenseBudget.objects.create(category='Rent', monthly_limit=1500)
+        ExpenseBudget.objects.create(category='Maintenance', monthly_limit=200)
+        months, rows = category_breakdown(datetime.date(2026, 3, 17))
+        self.assertEqual(months, [datetime.date(2025, 10, 1), datetime.date(2025, 11, 1), datetime.date(2025, 12, 1),
+                                  datetime.date(2026, 1, 1), datetime.date(2026, 2, 1), datetime.date(2026, 3, 1)])
+        self.assertEqual([(r['category'], r['spent'], r['budget'], r['variance'], r['percent_used']) for r in rows],
+                         [('Rent', 1000, 1500, 500, 66), ('Bills', 300, None, None, None),
+                          ('Maintenance', 0, 200, 200, 0)])
+        self.assertEqual(rows[0]['trend'], [0, 0, 0, 800, 0, 1000])
+
+    def test_breakdown_includes_archived_months(self):
+        ArchivedExpense.objects.create(id=999, title='Old rent', category='Rent', amount=400,
+                                       date_added=datetime.date(2025, 11, 2))
+        MonthlySummary.objects.create(year=2025, month=11, expenses=400)
+        _, rows = category_breakdown(datetime.date(2026, 1, 1))
+        self.assertEqual(rows[0]['trend'], [0, 0, 0, 400, 0, 800])
+
+    def test_budget_changes_are_superuser_only(self):
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        budget = {'action': 'budget', 'category': 'Rent', 'monthly_limit': '1500'}
+        self.assertEqual(self.client.post(reverse('expenses'), budget).status_code, 403)
+        self.client.force_login(self.owner)
+        self.client.post(reverse('expenses'), budget)
+        self.assertEqual(ExpenseBudget.objects.get().monthly_limit, 1500)
+        self.client.post(reverse('expenses'), {**budget, 'monthly_limit': '0'})
+        self.assertFalse(ExpenseBudget.objects.exists())
+
+    def test_filters(self):
+        self.client.force_login(self.owner)
+
+        def titles(**params):
+            return [e.title for e in self.client.get(reverse('expenses'), params).context['expenses']]
+
+        self.assertEqual(titles(month='2026-03'), ['Power', 'March rent'])
+        self.assertEqual(titles(month='2026-03', category='Rent'), ['March rent'])
+        self.assertEqual(titles(q='rent'), ['March rent', 'January rent'])
+        self.assertEqual(titles(month='not-a-month'), ['Power', 'March rent', 'January rent'])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='pw')
+        self.year = timezone.localdate().year - 1
+        category = Category.objects.create(name='Rice')
+        rice = Product.objects.create(name='Rice', category=category, price=80, cost_price=60, stock_quantity=10)
+        for month, qty in ((1, 1), (1, 2), (6, 3)):
+            record_sale(rice, qty, self.user, sale_date=timezone.make_aware(datetime.datetime(self.year, month, 15)))
+        Expense.objects.create(title='Rent', amount=500, added_by=self.user, date_added=datetime.date(self.year, 6, 1))
+
+    def test_moves_rows_and_keeps_figures(self):
+        before = {m: dict(v) for m, v in monthly_figures(self.year).items()}
+        self.assertEqual(archive_year(self.year, batch_size=2), (3, 1))
+        self.assertFalse(Sale.objects.exists() or Expense.objects.exists())
+        self.assertEqual((ArchivedSale.objects.count(), ArchivedExpense.objects.count()), (3, 1))
+        self.assertEqual({m: dict(v) for m, v in monthly_figures(self.year).items()}, before)
+        self.assertEqual(MonthlySummary.objects.get(year=self.year, month=1).sale_count, 2)
+        self.assertEqual(archive_year(self.year), (0, 0))  # a second run has nothing left to do
+
+    def test_only_closed_years(self):
+        with self.assertRaises(ValueError):
+            archive_year(self.year + 1)
+
+    def test_report_year_out_of_range(self):
+        self.client.force_login(self.user)
+        for year in ('0', '99999'):
+            self.assertEqual(self.client.get(reverse('profit_loss'), {'year': year}).status_code, 200)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        private = tempfile.TemporaryDirectory()
+        self.addCleanup(private.cleanup)
+        self.enterContext(override_settings(PRIVATE_FILES_ROOT=private.name))
+
+    def test_import_reads_excel_bom(self):
+        with open(jobs.job_file_path('products.csv'), 'w', encoding='utf-8-sig') as fh:
+            fh.write("name,category,price\nBasmati,Rice,120\n")
+        jobs.enqueue('import_products', {'file': 'products.csv'})
+        job = jobs.claim_next()
+        jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'created': 1, 'skipped_lines': []})
+
+    def test_export_is_private_to_its_owner(self):
+        owner = User.objects.create_user('owner', password='pw')
+        jobs.enqueue('export_sales', user=owner)
+        job = jobs.claim_next()
+        jobs.run_job(job)
+        job.refresh_from_db()
+        path = jobs.job_file_path(job.result['file'])
+        self.assertTrue(path.startswith(str(settings.PRIVATE_FILES_ROOT)))
+        self.assertFalse(path.startswith(str(settings.MEDIA_ROOT)))
+
+        self.client.force_login(User.objects.create_user('other', password='pw'))
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 404)
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 200)
+
+    def test_fail_stale_only_without_heartbeat(self):
+        hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        dead = Job.objects.create(kind='import_products', status=Job.STATUS_RUNNING,
+                                  started_at=hour_ago, heartbeat_at=hour_ago)
+        # Long-running but its worker is alive
+        busy = Job.objects.create(kind='import_products', status=Job.STATUS_RUNNING, started_at=hour_ago)
+        jobs.heartbeat([busy.pk])
+        self.assertEqual(jobs.fail_stale(datetime.timedelta(minutes=5)), 1)
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, Job.STATUS_FAILED)
+        self.assertEqual(Job.objects.get(pk=busy.pk).status, Job.STATUS_RUNNING)
+
+    def test_failed_job_is_not_marked_done(self):
+        job = Job.objects.create(kind='rebuild_staff_sales', status=Job.STATUS_FAILED)
+        jobs.run_job(job)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_FAILED)
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Cold start, measured with `python -X importtime` in a fresh interpreter."""
+
+    # Ceiling on the self time of our own modules, in ms. Deliberately loose:
+    # it is there to catch a heavy import creeping into startup, not to time
+    # the machine the tests run on.
+    CORE_BUDGET_MS = 400
+
+    def import_times(self, code):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'shop_project.settings'}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import django; django.setup(); {code}'],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        times = {}  # module -> self time in microseconds
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            self_us, _cumulative, name = line.removeprefix('import time:').split('|')
+            if self_us.strip().isdigit():  # skips the header line
+                times[name.strip()] = int(self_us)
+        return times
+
+    def test_worker_boot_stays_small(self):
+        # What `manage.py run_workers` loads before taking its first job
+        times = self.import_times('from core import jobs')
+        self.assertIn('core.jobs', times)
+        for module in ('core.views', 'core.forms', 'core.images', 'core.archive', 'csv', 'urllib.request'):
+            self.assertNotIn(module, times)
+
+    def test_views_defer_optional_modules(self):
+        times = self.import_times('import shop_project.urls')
+        for module in ('core.images', 'core.archive', 'core.expenses', 'core.payroll', 'urllib.request'):
+            self.assertNotIn(module, times)
+        core_ms = sum(us for name, us in times.items() if name.split('.')[0] == 'core') / 1000
+        self.assertLess(core_ms, self.CORE_BUDGET_MS)
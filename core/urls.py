@@ -12,6 +12,7 @@ urlpatterns = [
     path('edit-product/<int:pk>/', views.edit_product, name='edit_product'),
     path('delete-product/<int:pk>/', views.delete_product, name='delete_product'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
+    path('images/<str:name>', views.product_image, name='product_image'),
 
     # Categories
     path('add-category/', views.add_category, name='add_category'),
@@ -20,6 +21,12 @@ urlpatterns = [
 
     # Sales & Transactions
     path('sell/<int:pk>/', views.sell_product, name='sell_product'),
+    path('till/', views.till_view, name='till'),
+    path('till/scan/', views.till_scan, name='till_scan'),
+    path('till/remove/<int:pk>/', views.till_remove, name='till_remove'),
+    path('till/checkout/', views.till_checkout, name='till_checkout'),
+    path('sync/sales/', views.sync_sales, name='sync_sales'),
+    path('sync/catalogue/', views.sync_catalogue, name='sync_catalogue'),
     path('daily-sales/', views.daily_sales_view, name='daily_sales'), # Linked correctly
     path('sales-history/', views.sales_history, name='sales_history'),
 
@@ -32,7 +39,23 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     path('reports/', views.reports_view, name='reports'),
     path('customers/', views.customers_view, name='customers'),
+    path('customers/lookup/', views.customer_lookup, name='customer_lookup'),
     path('staff/', views.staff_view, name='staff'),
+    path('staff/payroll/', views.run_payroll_view, name='run_payroll'),
     path('suppliers/', views.suppliers_view, name='suppliers'),
     path('invoice/', views.invoice_view, name='invoice'),
+
+    # Branches
+    path('stores/', views.stores_view, name='stores'),
+    path('stores/switch/', views.switch_store, name='switch_store'),
+
+    # Background jobs
+    path('jobs/', views.jobs_view, name='jobs'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    path('jobs/export-sales/', views.export_sales, name='export_sales'),
+    path('jobs/import-products/', views.import_products, name='import_products'),
+
+    # Profiling reports (see core/profiling.py)
+    path('profiles/<str:name>', views.profile_report, name='profile_report'),
 ]
\ No newline at end of file
@@ -1,14 +1,32 @@
 import datetime
+import json
+import os
+import uuid
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum, Count, F, Q
 from django.db.models.functions import TruncDay, TruncMonth
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.http import require_POST
+from django.views.static import serve
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
-from .models import Product, Category, Sale, Expense ,Customer ,Staff ,Supplier
-from .forms import ProductForm, CategoryForm, SaleForm, ExpenseForm ,CustomerForm ,StaffForm ,SupplierForm
+from .models import Product, Category, Sale, Expense ,ExpenseBudget ,Customer ,Staff ,Supplier ,Job ,Store ,StoreStock
+from .forms import ProductForm, CategoryForm, SaleForm, ExpenseForm ,ExpenseFilterForm ,ExpenseBudgetForm ,CustomerForm ,StaffForm ,SupplierForm ,ProductImportForm ,PayrollForm ,ScanForm ,StoreForm ,StoreStockForm ,StockTransferForm
+from . import jobs
+from .barcodes import product_for_code
+from .caching import conditional_report
+from .pagination import keyset_page
+from .rollups import staff_leaderboard
+from .sales import MAX_SYNC_BATCH, BranchRequired, OutOfStock, apply_sale_batch, find_customer, record_sale
+from .stores import SESSION_KEY as STORE_SESSION_KEY, InsufficientStock, current_store, parse_stock_lines, receive_stock, transfer_stock
+# core.images, core.archive, core.expenses, core.payroll and core.profiling are
+# imported inside the few views that need them, so a fresh process doesn't
+# load them up front
 
 # --- TRAFFIC CONTROLLER ---
 def login_redirect_view(request):
@@ -17,19 +35,33 @@ def login_redirect_view(request):
     else:
         return redirect('home')
 
+def store_sales(store):
+    # Branch screens only touch their own partition of Sale (indexed on store, sale_date)
+    return Sale.objects.all() if store is None else Sale.objects.filter(store=store)
+
 # --- DASHBOARD / HOME ---
 @login_required
+@conditional_report
 def home(request):
     today = timezone.now().date()
-    todays_sales_data = Sale.objects.filter(sale_date__date=today).aggregate(Sum('total_price'), Count('id'))
+    store = current_store(request)
+    sales = store_sales(store)
+    todays_sales_data = sales.filter(sale_date__date=today).aggregate(Sum('total_price'), Count('id'))
     todays_sales = todays_sales_data['total_price__sum'] or 0
     todays_orders = todays_sales_data['id__count'] or 0
     
-    total_products = Product.objects.count()
-    total_value_data = Product.objects.aggregate(total=Sum(F('price') * F('stock_quantity')))
+    if store is None:
+        stock = Product.objects.annotate(shown_stock=F('stock_quantity'))
+        total_value_data = Product.objects.aggregate(total=Sum(F('price') * F('stock_quantity')))
+    else:
+        # A branch only looks at its own StoreStock rows
+        stock = Product.objects.filter(store_stock__store=store).annotate(shown_stock=F('store_stock__quantity'))
+        total_value_data = StoreStock.objects.filter(store=store, product__deleted_at__isnull=True).aggregate(
+            total=Sum(F('product__price') * F('quantity')))
+    total_products = stock.count()
     total_value = total_value_data['total'] or 0
     
-    low_stock_products = Product.objects.filter(stock_quantity__lt=5)
+    low_stock_products = stock.filter(shown_stock__lt=5).select_related('category')
     low_stock_count = low_stock_products.count()
     
     dates = []
@@ -37,10 +69,10 @@ def home(request):
     for i in range(6, -1, -1):
         date = today - datetime.timedelta(days=i)
         dates.append(date.strftime("%a"))
-        day_sales = Sale.objects.filter(sale_date__date=date).aggregate(Sum('total_price'))['total_price__sum'] or 0
+        day_sales = sales.filter(sale_date__date=date).aggregate(Sum('total_price'))['total_price__sum'] or 0
         sales_counts.append(float(day_sales))
         
-    recent_sales = Sale.objects.select_related('product', 'sold_by').order_by('-sale_date')[:5]
+    recent_sales = sales.select_related('product', 'sold_by').order_by('-sale_date')[:5]
 
     context = {
         'todays_sales': todays_sales,
@@ -57,11 +89,13 @@ def home(request):
 
 # --- DAILY SALES VIEW (Updated) ---
 @login_required
+@conditional_report
 def daily_sales_view(request):
     today = timezone.now().date()
     
     # Filter sales for today only
-    sales_today = Sale.objects.filter(sale_date__date=today).order_by('-sale_date')
+    sales_today = (store_sales(current_store(request)).filter(sale_date__date=today)
+                   .select_related('product__category', 'sold_by').order_by('-sale_date'))
     
     # Calculate totals
     total_revenue = sales_today.aggregate(Sum('total_price'))['total_price__sum'] or 0
@@ -75,6 +109,31 @@ def daily_sales_view(request):
     }
     return render(request, 'core/daily_sales.html', context)
 
+# --- PRODUCT IMAGES ---
+def _queue_product_image(request, product, form):
+    # Thumbnailing happens in the background; see core/images.py
+    upload = form.cleaned_data.get('image_upload')
+    if upload:
+        from . import images
+        digest = images.store_original(upload.read())
+        jobs.enqueue('product_images', {'ids': [product.pk], 'digest': digest}, user=request.user)
+    elif 'image_url' in form.changed_data:
+        if product.image_url:
+            jobs.enqueue('product_images', {'ids': [product.pk]}, user=request.user)
+        else:
+            Product.objects.filter(pk=product.pk).update(image_hash='')
+
+
+def product_image(request, name):
+    # Names are content hashes, so browsers and proxies may keep them forever
+    from . import images
+    if not images.THUMBNAIL_NAME_RE.match(name):
+        raise Http404
+    response = serve(request, name, document_root=images.image_dir())
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 # --- ADD PRODUCT ---
 @login_required
 def add_product(request):
@@ -84,6 +143,7 @@ def add_product(request):
             product = form.save(commit=False)
             product.cost_price = request.POST.get('cost_price', 0)
             product.save()
+            _queue_product_image(request, product, form)
             messages.success(request, "Product added successfully!")
             return redirect('inventory')
     else:
@@ -102,6 +162,7 @@ def edit_product(request, pk):
             if cost:
                 prod.cost_price = cost
             prod.save()
+            _queue_product_image(request, prod, form)
             return redirect('inventory')
     else:
         form = ProductForm(instance=product)
@@ -114,7 +175,7 @@ def delete_product(request, pk):
     if not request.user.is_superuser:
         raise PermissionDenied  
     product = get_object_or_404(Product, pk=pk)
-    product.delete()
+    product.soft_delete()  # its sales stay in the reports
     messages.success(request, "Product deleted.")
     return redirect('inventory')
 
@@ -148,7 +209,7 @@ def manage_categories(request):
 @login_required
 def delete_category(request, pk):
     category = get_object_or_404(Category, pk=pk)
-    category.delete()
+    category.soft_delete()
     return redirect('manage_categories')
 
 
@@ -160,58 +221,210 @@ def sell_product(request, pk):
         form = SaleForm(request.POST)
         if form.is_valid():
             quantity_sold = form.cleaned_data['quantity']
-            if product.stock_quantity >= quantity_sold:
-                product.stock_quantity -= quantity_sold
-                product.save()
-                
-                sale = form.save(commit=False)
-                sale.product = product
-                sale.total_price = product.price * quantity_sold
-                sale.sold_by = request.user
-                sale.save()
-                
+            try:
+                record_sale(product, quantity_sold, request.user, customer=form.cleaned_data['customer'],
+                            store=current_store(request))
+            except OutOfStock:
+                messages.error(request, "Not enough stock!")
+            except BranchRequired as e:
+                messages.error(request, str(e))
+            else:
                 messages.success(request, f"Sold {quantity_sold} of {product.name}!")
                 return redirect('daily_sales') # Updated redirect
-            else:
-                messages.error(request, "Not enough stock!")
     else:
         form = SaleForm()
-    return render(request, 'core/sell_product.html', {'product': product, 'form': form})
+    store = current_store(request)
+    if store is None:
+        available = product.stock_quantity
+    else:
+        available = (StoreStock.objects.filter(store=store, product=product)
+                     .values_list('quantity', flat=True).first() or 0)
+    return render(request, 'core/sell_product.html', {'product': product, 'form': form, 'available': available})
+
+
+# --- TILL (BARCODE SCANNING) ---
+# The basket lives in the session as {product_id: quantity}.
+def _till_cart(request):
+    return request.session.setdefault('till_cart', {})
+
+
+@login_required
+def till_view(request):
+    cart = _till_cart(request)
+    products = Product.objects.only('id', 'name', 'price', 'stock_quantity').in_bulk([int(pk) for pk in cart])
+    lines = []
+    for pk, quantity in cart.items():
+        product = products.get(int(pk))
+        if product:
+            lines.append({'product': product, 'quantity': quantity, 'total': product.price * quantity})
+    context = {
+        'form': ScanForm(),
+        'lines': lines,
+        'cart_total': sum(line['total'] for line in lines),
+        'max_sync_batch': MAX_SYNC_BATCH,
+    }
+    return render(request, 'core/till.html', context)
+
+
+@login_required
+@require_POST
+def till_scan(request):
+    wants_json = request.headers.get('Accept', '').startswith('application/json')
+    form = ScanForm(request.POST)
+    scanned = product_for_code(form.cleaned_data['code']) if form.is_valid() else None
+    if scanned is None:
+        if wants_json:
+            return JsonResponse({'found': False}, status=404)
+        messages.error(request, "Unknown barcode.")
+        return redirect('till')
+
+    cart = _till_cart(request)
+    key = str(scanned.id)
+    cart[key] = cart.get(key, 0) + (form.cleaned_data['quantity'] or 1)
+    request.session.modified = True
+    if wants_json:
+        return JsonResponse({'found': True, 'id': scanned.id, 'name': scanned.name,
+                             'price': str(scanned.price), 'quantity': cart[key]})
+    return redirect('till')
+
+
+@login_required
+@require_POST
+def till_remove(request, pk):
+    _till_cart(request).pop(str(pk), None)
+    request.session.modified = True
+    return redirect('till')
+
+
+@login_required
+@require_POST
+def till_checkout(request):
+    cart = _till_cart(request)
+    if not cart:
+        return redirect('till')
+    customer = find_customer(request.POST.get('customer_phone'))
+    store = current_store(request)
+    products = Product.objects.in_bulk([int(pk) for pk in cart])
+    try:
+        with transaction.atomic():
+            for i, (pk, quantity) in enumerate(cart.items()):
+                record_sale(products[int(pk)], quantity, request.user, customer=customer, new_visit=(i == 0),
+                            store=store)
+    except (OutOfStock, BranchRequired) as e:
+        messages.error(request, str(e))
+        return redirect('till')
+    except KeyError:
+        messages.error(request, "A product in the basket no longer exists.")
+        return redirect('till')
+
+    request.session['till_cart'] = {}
+    messages.success(request, "Sale complete!")
+    return redirect('till')
+
+
+# --- OFFLINE TILL SYNC ---
+@login_required
+@require_POST
+def sync_sales(request):
+    # Body: {"sales": [...], "on_conflict": "reject" | "accept"}; see core.sales.apply_sale_batch
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Body must be JSON.'}, status=400)
+    lines = body.get('sales') if isinstance(body, dict) else None
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        return JsonResponse({'error': "Expected {'sales': [...]}."}, status=400)
+    if len(lines) > MAX_SYNC_BATCH:
+        return JsonResponse({'error': f"At most {MAX_SYNC_BATCH} sales per batch."}, status=413)
+
+    try:
+        results = apply_sale_batch(lines, request.user, store=current_store(request),
+                                   accept_oversell=body.get('on_conflict') == 'accept')
+    except BranchRequired as e:
+        # Not a per-line rejection: the till keeps the batch and retries once a branch is picked
+        return JsonResponse({'error': str(e)}, status=409)
+    return JsonResponse({'results': results})
+
+
+@login_required
+def sync_catalogue(request):
+    # Barcode -> [id, name, price], cached by the till for scanning while offline
+    rows = Product.objects.exclude(sku=None).values_list('sku', 'id', 'name', 'price')
+    return JsonResponse({'products': {sku: [pk, name, str(price)] for sku, pk, name, price in rows}})
 
 
 # --- INVENTORY VIEW ---
+INVENTORY_PAGE_SIZE = 50
+INVENTORY_SORTS = {
+    'name': 'name',
+    'price': 'price',
+    'stock': 'shown_stock',
+    'category': 'category__name',
+}
+
+
 @login_required
 def inventory_view(request):
+    sort = request.GET.get('sort', 'name')
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in INVENTORY_SORTS:
+        sort_key, descending = 'name', False
+
+    # Only the columns the table shows; category comes in the same query
+    products = Product.objects.select_related('category').only(
+        'id', 'name', 'price', 'stock_quantity', 'image_hash', 'category__name')
+    store = current_store(request)
+    if store is None:
+        products = products.annotate(shown_stock=F('stock_quantity'))
+    else:
+        # Inner join on the branch's own stock rows (unique on store, product)
+        products = products.filter(store_stock__store=store).annotate(shown_stock=F('store_stock__quantity'))
     query = request.GET.get('q')
     if query:
-        products = Product.objects.filter(Q(name__icontains=query) | Q(category__name__icontains=query))
-    else:
-        products = Product.objects.all()
-    return render(request, 'core/inventory.html', {'products': products})
+        products = products.filter(Q(name__icontains=query) | Q(category__name__icontains=query))
+
+    page, next_cursor = keyset_page(products, INVENTORY_SORTS[sort_key], descending,
+                                    request.GET.get('after'), INVENTORY_PAGE_SIZE)
+    context = {
+        'products': page,
+        'next_cursor': next_cursor,
+        'sort': sort_key,
+        'descending': descending,
+        # Clicking the active column flips its direction
+        'sort_links': {k: f'-{k}' if k == sort_key and not descending else k for k in INVENTORY_SORTS},
+        'is_first_page': not request.GET.get('after'),
+    }
+    return render(request, 'core/inventory.html', context)
 
 
 
 # --- PROFIT & LOSS VIEW ---
 @login_required
+@conditional_report
 def profit_loss_view(request):
+    from .archive import monthly_figures, report_years
     today = timezone.now().date()
-    current_year = today.year
+    years = report_years()
+    try:
+        current_year = int(request.GET.get('year', today.year))
+    except ValueError:
+        current_year = today.year
+    current_year = min(max(current_year, years[-1]), years[0])  # ?year=0 or 99999 would overflow dates
     monthly_report = []
     
     total_revenue_year = 0
     total_cogs_year = 0
     total_opex_year = 0
-    
+
+    # Live rows plus the frozen summaries of anything already archived
+    figures = monthly_figures(current_year)
     for m in range(1, 13):
-        if m > today.month: break # Don't show future months
-        
-        monthly_sales = Sale.objects.filter(sale_date__year=current_year, sale_date__month=m)
-        revenue = monthly_sales.aggregate(Sum('total_price'))['total_price__sum'] or 0
+        if current_year == today.year and m > today.month: break # Don't show future months
         
-        cogs = sum((s.product.cost_price * s.quantity) for s in monthly_sales)
-        
-        monthly_expenses = Expense.objects.filter(date_added__year=current_year, date_added__month=m)
-        opex = monthly_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
+        revenue = figures[m]['revenue']
+        cogs = figures[m]['cogs']
+        opex = figures[m]['expenses']
         
         gross_profit = revenue - cogs
         net_profit = gross_profit - opex
@@ -232,6 +445,7 @@ def profit_loss_view(request):
 
     context = {
         'current_year': current_year,
+        'years': years,
         'monthly_report': monthly_report,
         'total_revenue': total_revenue_year,
         'total_expenses': total_opex_year, 
@@ -244,20 +458,64 @@ def profit_loss_view(request):
 
 
 # --- EXPENSES VIEW ---
+EXPENSE_PAGE_SIZE = 25
+
 @login_required
 def expenses_view(request):
+    from .expenses import add_months, category_breakdown, month_start
+    form = ExpenseForm()
+    budget_form = ExpenseBudgetForm()
     if request.method == 'POST':
-        form = ExpenseForm(request.POST)
-        if form.is_valid():
-            expense = form.save(commit=False)
-            expense.added_by = request.user
-            expense.save()
-            messages.success(request, "Expense added!")
-            return redirect('expenses')
-    else:
-        form = ExpenseForm()
-    expenses = Expense.objects.all().order_by('-date_added')
-    return render(request, 'core/expenses.html', {'form': form, 'expenses': expenses})
+        if request.POST.get('action') == 'budget':
+            if not request.user.is_superuser:
+                raise PermissionDenied
+            budget_form = ExpenseBudgetForm(request.POST)
+            if budget_form.is_valid():
+                category, limit = budget_form.cleaned_data['category'], budget_form.cleaned_data['monthly_limit']
+                if limit:
+                    ExpenseBudget.objects.update_or_create(category=category, defaults={'monthly_limit': limit})
+                else:
+                    ExpenseBudget.objects.filter(category=category).delete()
+                messages.success(request, "Budget updated.")
+                return redirect('expenses')
+        else:
+            form = ExpenseForm(request.POST)
+            if form.is_valid():
+                expense = form.save(commit=False)
+                expense.added_by = request.user
+                expense.save()
+                messages.success(request, "Expense added!")
+                return redirect('expenses')
+
+    filters = ExpenseFilterForm(request.GET)
+    filters.is_valid()  # bad values are just ignored
+    month = filters.cleaned_data.get('month')
+    category = filters.cleaned_data.get('category')
+    query = filters.cleaned_data.get('q')
+
+    expenses = Expense.objects.all()
+    if month:
+        expenses = expenses.filter(date_added__gte=month, date_added__lt=add_months(month, 1))
+    if category:
+        expenses = expenses.filter(category=category)
+    if query:
+        expenses = expenses.filter(title__icontains=query)
+    page, next_cursor = keyset_page(expenses, 'date_added', True, request.GET.get('after'), EXPENSE_PAGE_SIZE)
+
+    report_month = month_start(month or timezone.localdate())
+    trend_months, breakdown = category_breakdown(report_month)
+    context = {
+        'form': form,
+        'budget_form': budget_form,
+        'filters': filters,
+        'expenses': page,
+        'next_cursor': next_cursor,
+        'report_month': report_month,
+        'trend_months': trend_months,
+        'breakdown': breakdown,
+        'month_total': sum(row['spent'] for row in breakdown),
+    }
+    return render(request, 'core/expenses.html', context)
 
 @login_required
 def delete_expense(request, pk):
@@ -270,10 +528,14 @@ def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
     return render(request, 'core/product_detail.html', {'product': product})
 
+SALES_PAGE_SIZE = 100
+
 @login_required
+@conditional_report
 def sales_history(request):
-    sales = Sale.objects.all().order_by('-sale_date')
-    return render(request, 'core/sales_history.html', {'sales': sales})
+    sales = store_sales(current_store(request)).select_related('product', 'sold_by')
+    page, next_cursor = keyset_page(sales, 'sale_date', True, request.GET.get('after'), SALES_PAGE_SIZE)
+    return render(request, 'core/sales_history.html', {'sales': page, 'next_cursor': next_cursor})
 
 @login_required
 def profile(request):
@@ -294,8 +556,25 @@ def customers_view(request):
     else:
         form = CustomerForm()
     
-    customers = Customer.objects.all().order_by('-date_added')
-    return render(request, 'core/customers.html', {'form': form, 'customers': customers})
+    # Spend is a stored running total, so this is an index scan, not a GROUP BY over sales
+    sort = request.GET.get('sort')
+    if sort == 'spend':
+        customers = Customer.objects.order_by('-total_spent', 'id')
+    else:
+        customers = Customer.objects.order_by('-date_added')
+    return render(request, 'core/customers.html', {'form': form, 'customers': customers, 'sort': sort})
+
+
+@login_required
+def customer_lookup(request):
+    # Used by the till to identify a customer from their phone number
+    customer = find_customer(request.GET.get('phone'))
+    if customer is None:
+        return JsonResponse({'found': False}, status=404)
+    return JsonResponse({
+        'found': True, 'id': customer.pk, 'name': customer.name,
+        'total_spent': str(customer.total_spent), 'visit_count': customer.visit_count,
+    })
 
 @login_required
 def staff_view(request):
@@ -309,9 +588,45 @@ def staff_view(request):
         form = StaffForm()
     
     # Get all staff
-    staff_list = Staff.objects.all()
-    
-    return render(request, 'core/staff.html', {'form': form, 'staff_list': staff_list})
+    staff_list = Staff.objects.select_related('user')
+
+    # Leaderboard comes from the per-day rollup, not from scanning Sale
+    today = timezone.localdate()
+    periods = {
+        'today': today,
+        'week': today - datetime.timedelta(days=6),
+        'month': today.replace(day=1),
+        'year': today.replace(month=1, day=1),
+    }
+    period = request.GET.get('period', 'month')
+    if period not in periods:
+        period = 'month'
+    leaderboard = staff_leaderboard(periods[period], today)
+
+    context = {
+        'form': form,
+        'staff_list': staff_list,
+        'leaderboard': leaderboard,
+        'period': period,
+        'payroll_form': PayrollForm(initial={'month': today}),
+    }
+    return render(request, 'core/staff.html', context)
+
+
+@login_required
+@require_POST
+def run_payroll_view(request):
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    form = PayrollForm(request.POST)
+    if form.is_valid():
+        from .payroll import run_payroll
+        month = form.cleaned_data['month']
+        created = run_payroll(month, request.user)
+        messages.success(request, f"Payroll for {month:%B %Y}: {created} salary expense(s) booked.")
+    else:
+        messages.error(request, "Please pick a month.")
+    return redirect('staff')
 
 @login_required
 def suppliers_view(request):
@@ -330,4 +645,156 @@ def suppliers_view(request):
 
 
 @login_required
-def invoice_view(request): return render(request, 'core/invoice.html')
\ No newline at end of file
+def invoice_view(request): return render(request, 'core/invoice.html')
+
+
+# --- BACKGROUND JOBS ---
+# Heavy work is queued here and picked up by `manage.py run_workers`.
+def _user_jobs(request):
+    job_list = Job.objects.all()
+    if not request.user.is_superuser:
+        job_list = job_list.filter(created_by=request.user)
+    return job_list
+
+
+@login_required
+def jobs_view(request):
+    job_list = _user_jobs(request).order_by('-created_at')[:50]
+    return render(request, 'core/jobs.html', {'jobs': job_list, 'import_form': ProductImportForm()})
+
+
+@login_required
+def job_status(request, pk):
+    job = get_object_or_404(_user_jobs(request), pk=pk)
+    return JsonResponse({
+        'id': job.pk, 'kind': job.kind, 'status': job.status,
+        'progress': job.progress, 'total': job.total, 'percent': job.percent,
+        'result': job.result, 'error': job.error.strip().splitlines()[-1] if job.error else '',
+    })
+
+
+@login_required
+def job_download(request, pk):
+    job = get_object_or_404(_user_jobs(request), pk=pk, status=Job.STATUS_DONE)
+    name = job.result.get('file')
+    if not name:
+        raise Http404("This job has no file.")
+    path = jobs.job_file_path(os.path.basename(name))
+    if not os.path.exists(path):
+        raise Http404("File has been removed.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+# --- PROFILING ---
+@login_required
+def profile_report(request, name):
+    # Reports written by core.profiling.ProfilingMiddleware
+    from .profiling import REPORT_NAME_RE, report_dir
+    if not request.user.is_staff:
+        raise PermissionDenied
+    if not REPORT_NAME_RE.match(name):
+        raise Http404
+    path = os.path.join(report_dir(), name)
+    if not os.path.exists(path):
+        raise Http404("Report has been removed.")
+    if name.endswith('.txt'):
+        return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+@login_required
+@require_POST
+def export_sales(request):
+    jobs.enqueue('export_sales', user=request.user)
+    messages.success(request, "Sales export queued. It will appear below when ready.")
+    return redirect('jobs')
+
+
+@login_required
+@require_POST
+def import_products(request):
+    form = ProductImportForm(request.POST, request.FILES)
+    if form.is_valid():
+        name = f"import_{uuid.uuid4().hex}.csv"
+        with open(jobs.job_file_path(name), 'wb') as fh:
+            for chunk in form.cleaned_data['file'].chunks():
+                fh.write(chunk)
+        jobs.enqueue('import_products', {'file': name}, user=request.user)
+        messages.success(request, "Product import queued.")
+    else:
+        messages.error(request, "Please choose a CSV file to import.")
+    return redirect('jobs')
+
+
+# --- BRANCHES ---
+@login_required
+def stores_view(request):
+    store_form = StoreForm(prefix='store')
+    stock_form = StoreStockForm(prefix='stock')
+    transfer_form = StockTransferForm(prefix='transfer')
+
+    if request.method == 'POST':
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        action = request.POST.get('action')
+        if action == 'add_store':
+            store_form = StoreForm(request.POST, prefix='store')
+            if store_form.is_valid():
+                store_form.save()
+                messages.success(request, "Branch added.")
+                return redirect('stores')
+        elif action == 'receive':
+            stock_form = StoreStockForm(request.POST, prefix='stock')
+            if stock_form.is_valid():
+                lines, errors = parse_stock_lines(stock_form.cleaned_data['lines'])
+                if errors:
+                    for error in errors:
+                        messages.error(request, error)
+                else:
+                    receive_stock(stock_form.cleaned_data['store'], lines,
+                                  new_delivery=stock_form.cleaned_data['new_delivery'])
+                    messages.success(request, f"Stock added for {len(lines)} product(s).")
+                    return redirect('stores')
+        elif action == 'transfer':
+            transfer_form = StockTransferForm(request.POST, prefix='transfer')
+            if transfer_form.is_valid():
+                data = transfer_form.cleaned_data
+                lines, errors = parse_stock_lines(data['lines'])
+                for error in errors:
+                    messages.error(request, error)
+                if not errors:
+                    try:
+                        transfer_stock(data['from_store'], data['to_store'], lines, user=request.user)
+                    except InsufficientStock as e:
+                        names = dict(Product.objects.filter(pk__in=e.shortages).values_list('id', 'name'))
+                        for product_id, missing in e.shortages.items():
+                            messages.error(request, f"{names[product_id]}: {missing} short at {data['from_store']}.")
+                    else:
+                        messages.success(request, f"Moved {len(lines)} product(s) to {data['to_store']}.")
+                        return redirect('stores')
+
+    stores = Store.objects.annotate(products=Count('stock'), units=Sum('stock__quantity')).order_by('name')
+    context = {
+        'stores': stores,
+        'store_form': store_form,
+        'stock_form': stock_form,
+        'transfer_form': transfer_form,
+    }
+    return render(request, 'core/stores.html', context)
+
+
+@login_required
+@require_POST
+def switch_store(request):
+    try:
+        store_id = int(request.POST.get('store') or 0)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid branch.")
+    if store_id and not Store.objects.filter(pk=store_id).exists():
+        raise Http404
+    request.session[STORE_SESSION_KEY] = store_id
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        next_url = 'home'
+    return redirect(next_url)
@@ -16,14 +16,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
+# Development settings - the live server uses shop_project.settings_production
 
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-qm!pt@wtr6gx**%7s_175)4eh6#m-7g^pt5c#1w+o0!o1f^act'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-qm!pt@wtr6gx**%7s_175)4eh6#m-7g^pt5c#1w+o0!o1f^act')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = []
 
@@ -47,19 +48,18 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.audit.AuditMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'shop_project.urls'
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        # UPDATE THIS LINE BELOW:
-        'DIRS': [BASE_DIR / 'templates'], 
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -67,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.stores',
             ],
         },
     },
@@ -97,6 +98,30 @@ DATABASES = {
 # }
 
 
+# Cache, sessions and login
+# The local-memory cache is per process, which is fine for runserver; the
+# production settings swap in a cache every worker process shares.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# cached_db reads sessions from the cache and only falls back to the
+# database on a miss; writes still go to both, so nothing is lost on restart
+SESSION_ENGINE = os.environ.get('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+# Only one entry: every backend listed re-runs the password hasher on a
+# failed login. Sessions from the plain ModelBackend were moved over by
+# migration core 0022.
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+
+
+# Staff can profile a single request with ?profile=1 (core/profiling.py).
+# Off by default; when off the middleware drops out of the stack entirely.
+PROFILING_ENABLED = os.environ.get('DJANGO_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -129,20 +154,16 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 
 STATIC_URL = 'static/'
-LOGIN_REDIRECT_URL = 'home'
-
-LOGOUT_REDIRECT_URL = 'login'
-import os
 
+# Uploaded and generated public files (product images)
 MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
 
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Files only logged-in views may hand out (job imports/exports). Never put
+# this under MEDIA_ROOT: DEBUG serves MEDIA_ROOT to anyone.
+PRIVATE_FILES_ROOT = Path(os.environ.get('DJANGO_PRIVATE_FILES_ROOT', BASE_DIR / 'var'))
 
-LOGIN_REDIRECT_URL = 'login_redirect'  # We will create this rule next
-
-
-# Base url to serve media files
-MEDIA_URL = '/media/'
+LOGIN_REDIRECT_URL = 'login_redirect'  # sends each role to its own start page
+LOGOUT_REDIRECT_URL = 'login'
 
-# Path where media is stored
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
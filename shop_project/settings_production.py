@@ -0,0 +1,100 @@
+"""
+Production settings for shop_project.
+
+Point DJANGO_SETTINGS_MODULE at this module on the live server:
+    DJANGO_SETTINGS_MODULE=shop_project.settings_production
+
+and run `manage.py collectstatic` on every deploy (static files are served
+from STATIC_ROOT under hashed names).
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+# No fallbacks here: a missing key or host list should stop the server starting
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = [h.strip() for h in os.environ['DJANGO_ALLOWED_HOSTS'].split(',') if h.strip()]
+CSRF_TRUSTED_ORIGINS = [f'https://*{h}' if h.startswith('.') else f'https://{h}' for h in ALLOWED_HOSTS if h != '*']
+
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Reuse DB connections between requests instead of reconnecting every time
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))  # noqa: F405
+
+# --- Serving ---
+# Responses are compressed, and ConditionalGetMiddleware answers repeat
+# requests for unchanged pages with a 304. Static files get content-hashed
+# names from collectstatic so they can be cached forever. WhiteNoise, when
+# installed, serves them from the app with gzip/Brotli copies built at
+# collectstatic time; without it, point the web server at STATIC_ROOT.
+try:
+    import whitenoise  # noqa: F401
+except ImportError:
+    whitenoise = None
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # noqa: F405  (collectstatic target)
+
+MIDDLEWARE = list(MIDDLEWARE)  # noqa: F405
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                  'django.middleware.gzip.GZipMiddleware')
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.common.CommonMiddleware') + 1,
+                  'django.middleware.http.ConditionalGetMiddleware')
+if whitenoise:
+    # Straight after SecurityMiddleware, so static requests skip sessions/auth
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'whitenoise.middleware.WhiteNoiseMiddleware')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('whitenoise.storage.CompressedManifestStaticFilesStorage' if whitenoise
+                    else 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'),
+    },
+}
+
+# Sessions and users are cached, so every worker process has to see the same
+# cache (a per-process locmem cache would serve stale sessions). Redis when
+# it is configured, otherwise files on local disk shared by the processes.
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / '.cache')),  # noqa: F405
+        }
+    }
+
+# Templates are parsed once per process and then served from memory.
+# APP_DIRS has to be off when loaders are listed explicitly.
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.stores',
+            ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]